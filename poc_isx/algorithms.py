@@ -1,7 +1,18 @@
+import importlib
 import os
 
-import isx
-import numpy as np
+
+class _LazyModule:
+    # Defers importing heavy dependencies until an attribute is first used
+    def __init__(self, module_name):
+        self._module_name = module_name
+
+    def __getattr__(self, attribute):
+        return getattr(importlib.import_module(self._module_name), attribute)
+
+
+isx = _LazyModule("isx")
+np = _LazyModule("numpy")
 
 
 def preprocess_min_image(video_path: str) -> str:
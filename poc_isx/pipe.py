@@ -1,8 +1,6 @@
 import os
 from datetime import datetime
 
-import isx
-
 import algorithms
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -20,16 +18,14 @@ ALGORITHMS = {
 
 
 
-def log_step(log_path: str, step: str, input_file: str, output_file: str):
-    os.makedirs(os.path.dirname(log_path), exist_ok=True)
-    with open(log_path, 'a') as f:
-        timestamp = datetime.now().isoformat()
-        f.write(f"[{timestamp}] STEP: {step}\n")
-        f.write(f"    Input: {input_file}\n")
-        f.write(f"    Output: {output_file}\n\n")
+def log_step(log_file, step: str, input_file: str, output_file: str):
+    timestamp = datetime.now().isoformat()
+    log_file.write(f"[{timestamp}] STEP: {step}\n"
+                   f"    Input: {input_file}\n"
+                   f"    Output: {output_file}\n\n")
 
 
-def process(video_path: str, algorithms: list, log_path: str) -> list:
+def process(video_path: str, algorithms: list, log_file, report=print) -> list:
     if not os.path.isfile(video_path):
         raise FileNotFoundError(f"Video file does not exist: {video_path}")
 
@@ -43,9 +39,9 @@ def process(video_path: str, algorithms: list, log_path: str) -> list:
         if alg_name not in ALGORITHMS:
             raise ValueError(f"Algorithm {alg_name} not found in pipeline")
 
-        print(f"Applying algorithm: {alg_name} to {current_input}")
+        report(f"Applying algorithm: {alg_name} to {current_input}")
         output = ALGORITHMS[alg_name](current_input)
-        log_step(log_path, alg_name, current_input, output)
+        log_step(log_file, alg_name, current_input, output)
 
         results.append(output)
         current_input = output
@@ -53,7 +49,7 @@ def process(video_path: str, algorithms: list, log_path: str) -> list:
     return results
 
 
-def set_output(processed_paths: list, output_dir: str) -> None:
+def set_output(processed_paths: list, output_dir: str, report=print) -> None:
     os.makedirs(output_dir, exist_ok=True)
 
     for i, path in enumerate(processed_paths):
@@ -61,16 +57,15 @@ def set_output(processed_paths: list, output_dir: str) -> None:
         dst = os.path.join(output_dir, filename)
         if os.path.abspath(path) != os.path.abspath(dst):
             os.replace(path, dst)
-        print(f"Saved result {i} to {dst}")
-
+        report(f"Saved result {i} to {dst}")
 
-def apply_algorithms(input_path: str, output_dir: str, algorithms: list):
-    log_path = os.path.join(output_dir, "pipeline_log.txt")
-    if os.path.exists(log_path):
-        os.remove(log_path)
 
-    results = process(input_path, algorithms, log_path)
-    set_output(results, output_dir)
+def apply_algorithms(input_path: str, output_dir: str, algorithms: list, report=print):
+    # One handle for the whole run instead of reopening the log for every step
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, "pipeline_log.txt"), 'w') as log_file:
+        results = process(input_path, algorithms, log_file, report)
+    set_output(results, output_dir, report)
 
 
 if __name__ == "__main__":
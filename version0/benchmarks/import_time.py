@@ -0,0 +1,73 @@
+import argparse
+import os
+import subprocess
+import sys
+
+VERSION0_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("isx", "numpy")
+
+
+class ImportTimeReport:
+    def __init__(self, module_name, cumulative_times):
+        self._module_name = module_name
+        self._cumulative_times = cumulative_times
+
+    @classmethod
+    def measure(cls, module_name):
+        completed = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module_name}"],
+                                   cwd=VERSION0_DIRECTORY, capture_output=True, text=True, check=True)
+        return cls(module_name, cls._parse(completed.stderr))
+
+    @staticmethod
+    def _parse(importtime_output):
+        # Lines look like: "import time:   self [us] | cumulative | imported package"
+        cumulative_times = {}
+        for line in importtime_output.splitlines():
+            if not line.startswith("import time:"):
+                continue
+            _, cumulative, name = line[len("import time:"):].split("|")
+            if cumulative.strip().isdigit():
+                cumulative_times[name.strip()] = int(cumulative.strip())
+        return cumulative_times
+
+    def module_name(self):
+        return self._module_name
+
+    def imported_modules(self):
+        return set(self._cumulative_times)
+
+    def imports_any_of(self, module_names):
+        return sorted(name for name in self.imported_modules() if name.split(".")[0] in module_names)
+
+    def total_milliseconds(self):
+        return self._cumulative_times.get(self._module_name, 0) / 1000
+
+    def slowest(self, count):
+        return sorted(self._cumulative_times.items(), key=lambda item: item[1], reverse=True)[:count]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure cold import time of pipeline modules with -X importtime.")
+    parser.add_argument("modules", nargs="*", default=["isx_pipeline.isx_pipeline", "cli"])
+    parser.add_argument("--budget-ms", type=float, default=None, help="Fail if any module takes longer to import.")
+    parser.add_argument("--top", type=int, default=10, help="Number of slowest imports to show.")
+    arguments = parser.parse_args(argv)
+
+    failed = False
+    for module_name in arguments.modules:
+        report = ImportTimeReport.measure(module_name)
+        print(f"{module_name}: {report.total_milliseconds():.1f} ms")
+        for name, cumulative in report.slowest(arguments.top):
+            print(f"    {cumulative / 1000:8.1f} ms  {name}")
+        heavy_imports = report.imports_any_of(HEAVY_MODULES)
+        if heavy_imports:
+            print(f"    eagerly imports heavy modules: {', '.join(heavy_imports)}")
+            failed = True
+        if arguments.budget_ms is not None and report.total_milliseconds() > arguments.budget_ms:
+            print(f"    exceeds import budget of {arguments.budget_ms} ms")
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from ci_pipe.digest_store import DigestStore
+
+
+class ContentHasher:
+    def __init__(self, chunk_size=8 * 1024 * 1024, workers=None, cache=None):
+        self._chunk_size = chunk_size
+        self._workers = workers or min(8, os.cpu_count() or 1)
+        # SQLite digest store shared by sessions, so recordings processed by one are not processed again by another
+        self._cache = cache
+
+    def hash_file(self, path):
+        digest = hashlib.blake2b(digest_size=32)
+        with open(path, "rb") as file:
+            for chunk in iter(lambda: file.read(self._chunk_size), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def duplicates_in(self, paths, cache=None):
+        # Files with a unique size cannot have a duplicate, so only size collisions are hashed
+        cache = cache if cache is not None else {}
+        paths_by_size = {}
+        for path in paths:
+            paths_by_size.setdefault(os.path.getsize(path), []).append(path)
+        candidates = sorted(path for same_size in paths_by_size.values() if len(same_size) > 1 for path in same_size)
+        digests = self._digests_of(candidates, cache)
+        canonical_by_digest = {}
+        duplicates = {}
+        for path in candidates:
+            canonical = canonical_by_digest.setdefault(digests[path], path)
+            if canonical != path:
+                duplicates.setdefault(canonical, []).append(path)
+        return duplicates
+
+    def shared_duplicates_in(self, paths, cache, trace_path):
+        # Any other session may hold the same recording, so with a shared store every path is hashed
+        if self._cache is None:
+            return {}
+        digests = self._digests_of(paths, cache)
+        store = DigestStore.new_for(self._cache)
+        try:
+            canonicals = {path: store.register(digests[path], path, trace_path) for path in paths}
+        finally:
+            store.close()
+        return {path: canonical for path, canonical in canonicals.items() if canonical["trace_path"] != trace_path}
+
+    def claim(self, canonical, path, trace_path):
+        store = DigestStore.new_for(self._cache)
+        try:
+            store.reassign(canonical["digest"], path, trace_path)
+        finally:
+            store.close()
+
+    def _digests_of(self, paths, cache):
+        digests = {}
+        stale_paths = []
+        for path in paths:
+            stat = os.stat(path)
+            entry = cache.get(path)
+            if entry is not None and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+                digests[path] = entry["digest"]
+            else:
+                stale_paths.append((path, stat))
+        with ThreadPoolExecutor(max_workers=self._workers) as executor:
+            for (path, stat), digest in zip(stale_paths, executor.map(self.hash_file, [p for p, _ in stale_paths])):
+                cache[path] = {"size": stat.st_size, "mtime": stat.st_mtime, "digest": digest}
+                digests[path] = digest
+        return digests
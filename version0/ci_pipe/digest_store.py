@@ -0,0 +1,45 @@
+import os
+import sqlite3
+import time
+
+from utils import create_directory_from
+
+
+class DigestStore:
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS digests (
+            digest TEXT PRIMARY KEY,
+            file TEXT NOT NULL,
+            trace_path TEXT NOT NULL,
+            registered_at REAL NOT NULL
+        );
+    """
+
+    def __init__(self, connection):
+        self._connection = connection
+        self._connection.row_factory = sqlite3.Row
+        self._connection.executescript(self.SCHEMA)
+
+    @classmethod
+    def new_for(cls, database):
+        database = os.path.expanduser(database)
+        create_directory_from(os.path.dirname(os.path.abspath(database)))
+        return cls(sqlite3.connect(database, timeout=60))
+
+    def close(self):
+        self._connection.close()
+
+    def register(self, digest, file, trace_path):
+        # The first session to register a recording owns it; later ones get that session's file and trace back
+        with self._connection:
+            self._connection.execute(
+                "INSERT OR IGNORE INTO digests (digest, file, trace_path, registered_at) VALUES (?, ?, ?, ?)",
+                (digest, file, trace_path, time.time()))
+            row = self._connection.execute("SELECT digest, file, trace_path FROM digests WHERE digest = ?",
+                                           (digest,)).fetchone()
+        return dict(row)
+
+    def reassign(self, digest, file, trace_path):
+        with self._connection:
+            self._connection.execute("UPDATE digests SET file = ?, trace_path = ?, registered_at = ? WHERE digest = ?",
+                                     (file, trace_path, time.time(), digest))
@@ -0,0 +1,27 @@
+import shutil
+import time
+
+
+class DiskSpaceGovernor:
+    NOT_ENOUGH_SPACE_ERROR = "Not enough free disk space to continue"
+
+    def __init__(self, min_free_bytes, poll_seconds=30.0, max_wait_seconds=None, sleep=time.sleep,
+                 disk_usage=shutil.disk_usage):
+        self._min_free_bytes = min_free_bytes
+        self._poll_seconds = poll_seconds
+        self._max_wait_seconds = max_wait_seconds
+        self._sleep = sleep
+        self._disk_usage = disk_usage
+
+    def wait_for_space(self, path, on_wait=None):
+        waited_seconds = 0.0
+        while True:
+            free_bytes = self._disk_usage(path).free
+            if free_bytes >= self._min_free_bytes:
+                return waited_seconds
+            if self._max_wait_seconds is not None and waited_seconds >= self._max_wait_seconds:
+                raise OSError(f"{self.NOT_ENOUGH_SPACE_ERROR}: {free_bytes} bytes free in {path}")
+            if on_wait is not None:
+                on_wait(free_bytes)
+            self._sleep(self._poll_seconds)
+            waited_seconds += self._poll_seconds
@@ -0,0 +1,136 @@
+import json
+import os
+
+from ci_pipe.file_checkpoint import FileCheckpoint
+from ci_pipe.trace_builder import TraceBuilder
+from logger.file_logger import FileLogger
+from utils import build_filesystem_path_from, is_content_available_in
+
+
+class DryRunPlanner:
+    SKIPPED = "skipped"
+    RUN = "run"
+    NEW = "new"
+    RECOMPUTED = "recomputed"
+    QUARANTINED = "quarantined"
+    MISSING = "missing"
+    ARCHIVED = "archived"
+
+    UNPLANNABLE_STEP_ERROR = "Pipeline does not declare the files read and written by step"
+
+    def __init__(self, plan, history=None):
+        self._plan = plan
+        self._pipeline_class = plan.pipeline_class()
+        self._history = history
+
+    def plan(self):
+        step_files = [self._step_files_of(method) for method, _ in self._plan.steps()]
+        trace = self._read_json(build_filesystem_path_from(self._plan.output_directory(),
+                                                           self._plan.executor()["trace_file"]))
+        checkpoint = self._read_checkpoint()
+        traced_steps = self._steps_before_released_files(
+            TraceBuilder.build_steps_from_trace(trace) if trace else [], checkpoint)
+        completed_step_names = {step.info()["name"] for step in traced_steps}
+        # Same lookup order as a resumed pipeline: inputs first, then every traced step, then new steps
+        available = {"videos": [self._existing_file(file) for file in
+                                self._pipeline_class.input_files_in(self._plan.input_directory())]}
+        released_locations = TraceBuilder.released_locations_in(trace)
+        for step in traced_steps:
+            for key, files in step.step_output().items():
+                available[key] = [self._traced_file(file, released_locations) for file in files]
+        steps = []
+        # Step folders are numbered after the trace, which only grows with the steps that run
+        step_index = len(traced_steps)
+        for (method, params), (input_key, output_key) in zip(self._plan.steps(), step_files):
+            step_name = self._plan.step_name(method, params)
+            if step_name in completed_step_names:
+                steps.append({"step": step_name, "status": self.SKIPPED, "files": [], "read_bytes": 0})
+                continue
+            step_index += 1
+            files = [self._planned_file(step_name, file, checkpoint) for file in available.get(input_key, [])]
+            steps.append({"step": step_name, "status": self.RUN, "files": files, "read_bytes": self._total_of(
+                [file["bytes"] for file in files if file["status"] in (self.NEW, self.RECOMPUTED)])})
+            output_bytes_per_byte = self._output_bytes_per_byte(step_name)
+            available[output_key] = [
+                self._planned_output(file, self._pipeline_class.planned_output_file(
+                    method, file["file"], self._plan.output_directory(), step_index, step_name), output_bytes_per_byte)
+                for file in files if file["status"] != self.QUARANTINED]
+        return {"steps": steps, "read_bytes": self._total_of([step["read_bytes"] for step in steps])}
+
+    def _steps_before_released_files(self, steps, checkpoint):
+        # Same rewind as a resumed pipeline: files released from quarantine send their step back to the plan
+        released_step_names = checkpoint.released_step_names() if checkpoint is not None else set()
+        for index, step in enumerate(steps):
+            if step.info()["name"] in released_step_names:
+                return steps[:index]
+        return steps
+
+    def _step_files_of(self, method):
+        step_files = getattr(self._pipeline_class, "STEP_FILES", {})
+        if method not in step_files:
+            raise ValueError(f"{self.UNPLANNABLE_STEP_ERROR}: '{method}'")
+        return step_files[method]
+
+    def _planned_file(self, step_name, file, checkpoint):
+        planned_file = dict(file)
+        if file.get("archived"):
+            # Compressed by the retention policy, it has to be restored before the step can read it
+            planned_file["status"] = self.ARCHIVED
+        elif checkpoint is not None and checkpoint.is_quarantined(step_name, file["file"]):
+            planned_file["status"] = self.QUARANTINED
+        elif checkpoint is not None and checkpoint.is_completed(step_name, file["file"]):
+            planned_file["status"] = self.SKIPPED
+        elif file["planned"]:
+            # Written by an earlier planned step before this one reads it
+            planned_file["status"] = self.RECOMPUTED if checkpoint is not None and checkpoint.has_record_of(
+                step_name, file["file"]) else self.NEW
+        elif not is_content_available_in(file["file"]):
+            planned_file["status"] = self.MISSING
+        elif checkpoint is not None and checkpoint.has_record_of(step_name, file["file"]):
+            planned_file["status"] = self.RECOMPUTED
+        else:
+            planned_file["status"] = self.NEW
+        return planned_file
+
+    def _planned_output(self, file, output_file, output_bytes_per_byte):
+        if file["status"] == self.SKIPPED:
+            return {**self._existing_file(output_file), "planned": True}
+        # Outputs change size between steps, so they are projected through the ratio recorded for the step
+        output_bytes = None
+        if file["bytes"] is not None and output_bytes_per_byte is not None:
+            output_bytes = round(file["bytes"] * output_bytes_per_byte)
+        return {"file": output_file, "bytes": output_bytes, "planned": True}
+
+    def _output_bytes_per_byte(self, step_name):
+        if self._history is None:
+            return None
+        rate = self._history.rate(step_name, self._plan.backend())
+        return rate.get("output_bytes_per_byte") if rate is not None else None
+
+    def _total_of(self, sizes):
+        # Unknown once any file that is read has no size yet
+        return sum(sizes) if None not in sizes else None
+
+    def _traced_file(self, file, released_locations):
+        if released_locations.get(file) is None:
+            return self._existing_file(file)
+        return {**self._existing_file(released_locations[file]), "archived": True}
+
+    def _existing_file(self, file):
+        try:
+            size = os.stat(file).st_size
+        except OSError:
+            size = 0
+        return {"file": file, "bytes": size, "planned": False}
+
+    def _read_checkpoint(self):
+        path = build_filesystem_path_from(self._plan.output_directory(), FileCheckpoint.FILENAME)
+        if not is_content_available_in(path):
+            return None
+        return FileCheckpoint(FileLogger(path, self._plan.output_directory()))
+
+    def _read_json(self, path):
+        if not is_content_available_in(path):
+            return {}
+        with open(path, "r", encoding="utf-8") as file:
+            return json.load(file)
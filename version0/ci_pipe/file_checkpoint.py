@@ -0,0 +1,81 @@
+from logger.file_logger import FileLogger
+from utils import is_content_available_in
+
+
+class FileCheckpoint:
+    FILENAME = "checkpoint.json"
+    NOT_QUARANTINED_ERROR = "File is not quarantined in this step"
+
+    def __init__(self, logger):
+        self._logger = logger
+        self._checkpoint = logger.read_json_from_file()
+
+    @classmethod
+    def new_for(cls, directory):
+        return cls(FileLogger.new_for(cls.FILENAME, directory))
+
+    def is_completed(self, step_name, input_file):
+        output_files = self._step(step_name)["completed"].get(input_file)
+        return output_files is not None and all(is_content_available_in(f) for f in output_files)
+
+    def has_record_of(self, step_name, input_file):
+        step = self._checkpoint.get(step_name, {})
+        return any(input_file in step.get(record, ()) for record in ("completed", "failed", "released"))
+
+    def is_quarantined(self, step_name, input_file):
+        return input_file in self._step(step_name)["quarantined"]
+
+    def mark_completed(self, step_name, input_file, output_files):
+        step = self._step(step_name)
+        step["completed"][input_file] = list(output_files)
+        step["failed"].pop(input_file, None)
+        self._forget_release(step, input_file)
+        self._save()
+
+    def mark_failed(self, step_name, input_file, error):
+        failure = self._step(step_name)["failed"].setdefault(input_file, {"runs": 0, "error": None})
+        failure["runs"] += 1
+        failure["error"] = repr(error)
+        self._forget_release(self._step(step_name), input_file)
+        self._save()
+        return failure["runs"]
+
+    def quarantine(self, step_name, input_file):
+        self._step(step_name)["quarantined"].append(input_file)
+        self._save()
+
+    def release_quarantine(self, step_name, input_file):
+        step = self._step(step_name)
+        if input_file not in step["quarantined"]:
+            raise ValueError(f"{self.NOT_QUARANTINED_ERROR}: '{input_file}'")
+        step["quarantined"].remove(input_file)
+        step["failed"].pop(input_file, None)
+        step.setdefault("released", []).append(input_file)
+        self._save()
+
+    def released_step_names(self):
+        return {step_name for step_name, step in self._checkpoint.items() if step.get("released")}
+
+    def files_kept_for_quarantine(self):
+        # A step with quarantined or released files runs again once they are released, reading its inputs and
+        # skipping inputs whose outputs still exist, so retention must leave all of them in place
+        files = set()
+        for step in self._checkpoint.values():
+            if step["quarantined"] or step.get("released"):
+                files.update(step["quarantined"], step.get("released", []), step["completed"])
+                files.update(file for output_files in step["completed"].values() for file in output_files)
+        return files
+
+    def quarantined_files(self):
+        return {step_name: list(step["quarantined"]) for step_name, step in self._checkpoint.items()
+                if step["quarantined"]}
+
+    def _step(self, step_name):
+        return self._checkpoint.setdefault(step_name, {"completed": {}, "failed": {}, "quarantined": []})
+
+    def _forget_release(self, step, input_file):
+        if input_file in step.get("released", []):
+            step["released"].remove(input_file)
+
+    def _save(self):
+        self._logger.write_json_to_file(self._checkpoint)
@@ -0,0 +1,33 @@
+class LineageIndex:
+    def __init__(self):
+        self._parents = {}
+        self._children = {}
+
+    @classmethod
+    def from_steps(cls, steps):
+        index = cls()
+        for step in steps:
+            index.add(step.lineage())
+        return index
+
+    def add(self, lineage):
+        for output_file, input_files in lineage.items():
+            self._parents.setdefault(output_file, set()).update(input_files)
+            for input_file in input_files:
+                self._children.setdefault(input_file, set()).add(output_file)
+
+    def parents_of(self, file):
+        return self._parents.get(file, set())
+
+    def children_of(self, file):
+        return self._children.get(file, set())
+
+    def descendants_of(self, file):
+        descendants = set()
+        pending = [file]
+        while pending:
+            for child in self.children_of(pending.pop()):
+                if child not in descendants:
+                    descendants.add(child)
+                    pending.append(child)
+        return descendants
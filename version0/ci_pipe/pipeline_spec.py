@@ -0,0 +1,195 @@
+import hashlib
+import inspect
+import json
+import os
+
+from ci_pipe.content_hasher import ContentHasher
+from ci_pipe.disk_space_governor import DiskSpaceGovernor
+from ci_pipe.retention_policy import RetentionPolicy
+from ci_pipe.retry_policy import RetryPolicy
+from ci_pipe.step_plan import StepPlan
+from ci_pipe.throughput_history import ThroughputHistory
+from ci_pipe.work_queue import WorkQueueExecutor
+from logger.event_bus import EventBus
+from utils import create_directory_from, build_filesystem_path_from, is_content_available_in
+
+
+class PipelineSpec:
+    UNSUPPORTED_FORMAT_ERROR = "Unsupported pipeline spec format, expected .json, .yaml, .yml or .toml"
+    MISSING_PARSER_ERROR = "Pipeline spec format requires a parser that is not installed"
+    INVALID_SPEC_ERROR = "Pipeline spec must be a mapping"
+    MISSING_KEY_ERROR = "Pipeline spec is missing required key"
+    UNKNOWN_KEY_ERROR = "Pipeline spec has unknown key"
+    EMPTY_STEPS_ERROR = "Pipeline spec must define at least one step"
+    INVALID_STEP_ERROR = "Pipeline spec step must be a step name or a mapping with 'step' and optional 'params'"
+    UNKNOWN_STEP_ERROR = "Pipeline spec references a step the pipeline does not define"
+    INVALID_PARAMS_ERROR = "Pipeline spec step parameters do not match the step signature"
+    UNKNOWN_EXECUTOR_KEY_ERROR = "Pipeline spec has unknown executor setting"
+    INVALID_EXECUTOR_ERROR = "Pipeline spec executor setting is invalid"
+
+    REQUIRED_KEYS = ("input_directory", "output_directory", "steps")
+    OPTIONAL_KEYS = ("executor",)
+    EXECUTOR_KEYS = ("pipeline", "trace_file", "retry", "events", "retention", "disk_space", "deduplicate",
+                     "work_queue", "history")
+
+    def __init__(self, data):
+        self._data = data
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, "rb") as file:
+            return cls.from_bytes(file.read(), path)
+
+    @classmethod
+    def from_bytes(cls, content, path):
+        extension = os.path.splitext(path)[1].lower()
+        if extension == ".json":
+            data = json.loads(content)
+        elif extension in (".yaml", ".yml"):
+            data = cls._yaml_module().safe_load(content)
+        elif extension == ".toml":
+            data = cls._toml_module().loads(content.decode("utf-8"))
+        else:
+            raise ValueError(cls.UNSUPPORTED_FORMAT_ERROR)
+        return cls(data)
+
+    @classmethod
+    def _yaml_module(cls):
+        try:
+            import yaml
+        except ImportError:
+            raise ValueError(f"{cls.MISSING_PARSER_ERROR}: pyyaml")
+        return yaml
+
+    @classmethod
+    def _toml_module(cls):
+        try:
+            import tomllib
+            return tomllib
+        except ImportError:
+            pass
+        try:
+            import tomli
+        except ImportError:
+            raise ValueError(f"{cls.MISSING_PARSER_ERROR}: tomli")
+        return tomli
+
+    def compile(self):
+        self._validate_keys()
+        executor = dict(self._data.get("executor") or {})
+        self._validate_executor(executor)
+        steps = [self._normalized_step(step) for step in self._data["steps"]]
+        plan = StepPlan(self._data["input_directory"], self._data["output_directory"], steps, executor)
+        self._validate_steps_against(plan.pipeline_class(), plan.steps())
+        return plan
+
+    def _validate_keys(self):
+        if not isinstance(self._data, dict):
+            raise ValueError(self.INVALID_SPEC_ERROR)
+        for key in self.REQUIRED_KEYS:
+            if key not in self._data:
+                raise ValueError(f"{self.MISSING_KEY_ERROR}: '{key}'")
+        for key in self._data:
+            if key not in self.REQUIRED_KEYS + self.OPTIONAL_KEYS:
+                raise ValueError(f"{self.UNKNOWN_KEY_ERROR}: '{key}'")
+        if not self._data["steps"]:
+            raise ValueError(self.EMPTY_STEPS_ERROR)
+
+    def _validate_executor(self, executor):
+        for key in executor:
+            if key not in self.EXECUTOR_KEYS:
+                raise ValueError(f"{self.UNKNOWN_EXECUTOR_KEY_ERROR}: '{key}'")
+        if "retry" in executor:
+            self._validate_options_against(RetryPolicy, executor["retry"], "retry")
+        if "events" in executor:
+            self._validate_options_against(EventBus.from_settings, executor["events"], "events", None)
+        if "retention" in executor:
+            self._validate_options_against(RetentionPolicy, executor["retention"], "retention")
+            RetentionPolicy(**executor["retention"])
+        if "disk_space" in executor:
+            self._validate_options_against(DiskSpaceGovernor, executor["disk_space"], "disk_space")
+        if "deduplicate" in executor:
+            self._validate_options_against(ContentHasher, executor["deduplicate"], "deduplicate")
+        if "work_queue" in executor:
+            self._validate_options_against(WorkQueueExecutor.from_settings, executor["work_queue"], "work_queue")
+        if "history" in executor:
+            self._validate_options_against(ThroughputHistory.new_for, executor["history"], "history")
+
+    def _validate_options_against(self, option_factory, options, key, *leading_arguments):
+        try:
+            inspect.signature(option_factory).bind(*leading_arguments, **options)
+        except TypeError:
+            raise ValueError(f"{self.INVALID_EXECUTOR_ERROR}: '{key}'")
+
+    def _normalized_step(self, step):
+        if isinstance(step, str):
+            return step, {}
+        if isinstance(step, dict) and "step" in step and set(step) <= {"step", "params"}:
+            return step["step"], step.get("params") or {}
+        raise ValueError(self.INVALID_STEP_ERROR)
+
+    def _validate_steps_against(self, pipeline_class, steps):
+        for method, params in steps:
+            if method not in getattr(pipeline_class, "STEPS", ()):
+                raise ValueError(f"{self.UNKNOWN_STEP_ERROR}: '{method}'")
+            try:
+                inspect.signature(getattr(pipeline_class, method)).bind(None, **params)
+            except TypeError:
+                raise ValueError(f"{self.INVALID_PARAMS_ERROR}: '{method}'")
+
+
+class PlanCache:
+    # Bump when the compiled plan layout changes so stale entries are ignored
+    PLAN_FORMAT_VERSION = "1"
+
+    def __init__(self, directory):
+        self._directory = directory
+        self._plans = {}
+
+    def plan_for(self, spec_path):
+        with open(spec_path, "rb") as file:
+            content = file.read()
+        key = self.key_for(content, os.path.splitext(spec_path)[1].lower())
+        if key in self._plans:
+            return self._plans[key]
+        plan = self._read(key)
+        if plan is None or not self._matches_pipeline(plan):
+            plan = PipelineSpec.from_bytes(content, spec_path).compile()
+            self._write(key, plan)
+        self._plans[key] = plan
+        return plan
+
+    def key_for(self, content, extension):
+        digest = hashlib.sha256(f"{self.PLAN_FORMAT_VERSION}{extension}".encode("utf-8"))
+        digest.update(content)
+        return digest.hexdigest()
+
+    @staticmethod
+    def _matches_pipeline(plan):
+        # The key only covers the spec, so a cached plan is re-checked against the pipeline's current STEPS
+        try:
+            PipelineSpec(plan.as_dict())._validate_steps_against(plan.pipeline_class(), plan.steps())
+        except ValueError:
+            return False
+        return True
+
+    def _entry_path(self, key):
+        return build_filesystem_path_from(self._directory, f"{key}.json")
+
+    def _read(self, key):
+        path = self._entry_path(key)
+        if not is_content_available_in(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                return StepPlan.from_dict(json.load(file))
+        except (ValueError, KeyError):
+            return None
+
+    def _write(self, key, plan):
+        create_directory_from(self._directory)
+        path = self._entry_path(key)
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as file:
+            json.dump(plan.as_dict(), file, indent=4)
+        os.replace(temporary_path, path)
@@ -0,0 +1,157 @@
+import os
+import time
+
+
+class ProgressEstimator:
+    def __init__(self, history, backend, frame_counter=None):
+        self._history = history
+        self._backend = backend
+        self._frame_counter = frame_counter
+
+    def measure(self, files):
+        sizes = {file: self._size_of(file) for file in files}
+        frames = {file: self._frame_counter(file) if self._frame_counter is not None else None for file in files}
+        return sizes, frames
+
+    @staticmethod
+    def _size_of(file):
+        # A file that vanished or cannot be read counts as empty here; processing it fails per file in the executor
+        try:
+            return os.path.getsize(file)
+        except OSError:
+            return 0
+
+    def volume_of(self, files):
+        sizes, frames = self.measure([file for file in files if os.path.isfile(file)])
+        return sum(sizes.values()), self._total_frames(frames)
+
+    def rate(self, step_name):
+        if self._history is None:
+            return None
+        return self._history.rate(step_name, self._backend)
+
+    def estimate_seconds(self, step_name, sizes, frames):
+        return self.seconds_for(self.rate(step_name), sum(sizes.values()), self._total_frames(frames))
+
+    def estimate_plan(self, plan, input_files, completed_step_names=()):
+        sizes, frames = self.measure(input_files)
+        step_files = getattr(plan.pipeline_class(), "STEP_FILES", {})
+        first_method = plan.steps()[0][0] if plan.steps() else None
+        # Later steps read what earlier ones wrote, so their volume is projected through recorded output ratios;
+        # without one it stays unknown rather than reusing the size of the raw recordings
+        volumes = {step_files.get(first_method, (None, None))[0]: (sum(sizes.values()), self._total_frames(frames))}
+        steps = []
+        for method, params in plan.steps():
+            step_name = plan.step_name(method, params)
+            input_key, output_key = step_files.get(method, (None, None))
+            total_bytes, total_frames = volumes.get(input_key, (None, None))
+            rate = self.rate(step_name)
+            volumes[output_key] = self._projected_output(rate, total_bytes, total_frames)
+            if step_name in completed_step_names:
+                continue
+            steps.append({"step": step_name, "seconds": self.seconds_for(rate, total_bytes, total_frames)})
+        known_seconds = [step["seconds"] for step in steps]
+        return {
+            "steps": steps,
+            "total_seconds": sum(known_seconds) if None not in known_seconds else None,
+            "bytes": sum(sizes.values()),
+            "frames": self._total_frames(frames)
+        }
+
+    @staticmethod
+    def seconds_for(rate, total_bytes, total_frames):
+        # Frame rates transfer across steps better than byte rates because outputs change size between steps
+        if rate is None:
+            return None
+        if total_frames is not None and rate["frames_per_second"]:
+            return total_frames / rate["frames_per_second"]
+        if total_bytes is None:
+            return None
+        return total_bytes / rate["bytes_per_second"]
+
+    @staticmethod
+    def _projected_output(rate, total_bytes, total_frames):
+        if rate is None:
+            return None, None
+        output_bytes = None
+        if total_bytes is not None and rate.get("output_bytes_per_byte") is not None:
+            output_bytes = total_bytes * rate["output_bytes_per_byte"]
+        output_frames = None
+        if total_frames is not None and rate.get("output_frames_per_frame") is not None:
+            output_frames = total_frames * rate["output_frames_per_frame"]
+        return output_bytes, output_frames
+
+    @staticmethod
+    def _total_frames(frames):
+        if not frames or None in frames.values():
+            return None
+        return sum(frames.values())
+
+
+class StepProgress:
+    def __init__(self, step_name, backend, sizes, frames, expected_rate=None, clock=time.monotonic):
+        self._step_name = step_name
+        self._backend = backend
+        self._sizes = sizes
+        self._frames = frames
+        self._expected_rate = expected_rate
+        self._clock = clock
+        self._started_at = clock()
+        self._finished_files = set()
+        self._succeeded_files = set()
+        self._output_bytes = {}
+        self._output_frames = {}
+
+    def step_name(self):
+        return self._step_name
+
+    def file_finished(self, file, succeeded, output_bytes=0, output_frames=None):
+        self._finished_files.add(file)
+        if succeeded:
+            self._succeeded_files.add(file)
+            self._output_bytes[file] = output_bytes
+            self._output_frames[file] = output_frames
+
+    def elapsed_seconds(self):
+        return self._clock() - self._started_at
+
+    def processed_bytes(self):
+        return sum(self._sizes[file] for file in self._succeeded_files)
+
+    def processed_frames(self):
+        frames = [self._frames[file] for file in self._succeeded_files]
+        return None if None in frames else sum(frames)
+
+    def output_bytes(self):
+        return sum(self._output_bytes.values())
+
+    def output_frames(self):
+        frames = list(self._output_frames.values())
+        return None if None in frames else sum(frames)
+
+    def snapshot(self):
+        remaining_files = [file for file in self._sizes if file not in self._finished_files]
+        remaining_bytes = sum(self._sizes[file] for file in remaining_files)
+        remaining_frames = ProgressEstimator._total_frames({file: self._frames[file] for file in remaining_files})
+        return {
+            "backend": self._backend,
+            "files_done": len(self._finished_files),
+            "files_total": len(self._sizes),
+            "bytes_done": sum(self._sizes[file] for file in self._finished_files),
+            "bytes_total": sum(self._sizes.values()),
+            "elapsed_seconds": round(self.elapsed_seconds(), 3),
+            "eta_seconds": self._eta_seconds(remaining_bytes, remaining_frames)
+        }
+
+    def _eta_seconds(self, remaining_bytes, remaining_frames):
+        if not remaining_bytes and remaining_frames in (None, 0):
+            return 0.0
+        rate = self._expected_rate
+        processed_bytes = self.processed_bytes()
+        if processed_bytes and self.elapsed_seconds() > 0:
+            # Once files finish, the throughput observed in this run is the best predictor
+            processed_frames = self.processed_frames()
+            rate = {"bytes_per_second": processed_bytes / self.elapsed_seconds(),
+                    "frames_per_second": processed_frames / self.elapsed_seconds() if processed_frames else None}
+        seconds = ProgressEstimator.seconds_for(rate, remaining_bytes, remaining_frames)
+        return round(seconds, 3) if seconds is not None else None
@@ -0,0 +1,44 @@
+import gzip
+import os
+import shutil
+
+from utils import is_content_available_in
+
+
+class RetentionPolicy:
+    KEEP = "keep"
+    DELETE = "delete"
+    COMPRESS = "compress"
+    INVALID_MODE_ERROR = "Retention mode must be one of 'keep', 'delete' or 'compress'"
+
+    def __init__(self, mode=KEEP):
+        if mode not in (self.KEEP, self.DELETE, self.COMPRESS):
+            raise ValueError(self.INVALID_MODE_ERROR)
+        self._mode = mode
+
+    def releases_files(self):
+        return self._mode != self.KEEP
+
+    def release(self, files):
+        # Returns the bytes reclaimed and where each released file went: its archive, or None once deleted
+        reclaimed_bytes = 0
+        locations = {}
+        for file in files:
+            if not is_content_available_in(file) or not os.path.isfile(file):
+                continue
+            original_size = os.path.getsize(file)
+            if self._mode == self.DELETE:
+                os.remove(file)
+                reclaimed_bytes += original_size
+                locations[file] = None
+            elif self._mode == self.COMPRESS:
+                locations[file] = self._compress(file)
+                reclaimed_bytes += original_size - os.path.getsize(locations[file])
+        return reclaimed_bytes, locations
+
+    def _compress(self, file):
+        compressed_file = f"{file}.gz"
+        with open(file, "rb") as source, gzip.open(compressed_file, "wb") as destination:
+            shutil.copyfileobj(source, destination)
+        os.remove(file)
+        return compressed_file
@@ -0,0 +1,31 @@
+import time
+
+
+class RetryPolicy:
+    def __init__(self, max_attempts=3, backoff_seconds=1.0, backoff_factor=2.0, quarantine_after=3, sleep=time.sleep):
+        self._max_attempts = max_attempts
+        self._backoff_seconds = backoff_seconds
+        self._backoff_factor = backoff_factor
+        self._quarantine_after = quarantine_after
+        self._sleep = sleep
+
+    def run(self, function):
+        for attempt in range(1, self._max_attempts + 1):
+            try:
+                return function()
+            except Exception:
+                if attempt == self._max_attempts:
+                    raise
+                self._sleep(self.delay_for(attempt))
+
+    def max_attempts(self):
+        return self._max_attempts
+
+    def delays(self):
+        return [self.delay_for(attempt) for attempt in range(1, self._max_attempts)]
+
+    def delay_for(self, attempt):
+        return self._backoff_seconds * self._backoff_factor ** (attempt - 1)
+
+    def should_quarantine(self, failed_runs):
+        return failed_runs >= self._quarantine_after
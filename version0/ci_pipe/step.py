@@ -1,31 +1,58 @@
+import os
+import time
+
+
 class Step:
     def __init__(self, step_name, step_input, look_up_function=None, step_function=None, args=None, kwargs=None,
-                 step_outputs=None):
+                 step_outputs=None, timing=None, lineage=None, released=None):
         self._step_name = step_name
         self._step_function = step_function
         self._step_input = step_input
         self._args = args if args is not None else []
         self._kwargs = kwargs if kwargs is not None else {}
+        self._timing = dict(timing) if timing is not None else {}
+        self._lineage = dict(lineage) if lineage is not None else {}
+        self._released = dict(released) if released is not None else {}
         # TODO: Make this more declarative
         if step_outputs is not None:
             self._step_outputs = step_outputs
         elif self._step_function is not None and look_up_function is not None:
+            started_at = time.time()
             self._step_outputs = self._step_function(look_up_function, *self._args, **self._kwargs)
+            # Step files may be relative, so the directory they are relative to travels with the timing
+            self._timing = {"started_at": started_at, "finished_at": time.time(), "working_directory": os.getcwd()}
         else:
             self._step_outputs = None
 
     @classmethod
-    def from_log(cls, step_name, step_input, step_outputs):
+    def from_log(cls, step_name, step_input, step_outputs, timing=None, lineage=None, released=None):
         # Below code is needed to match the Step constructor signature, but we don't use these parameters
         # since we are providing step_outputs directly. Think better design later.
         def dummy_func(*args, **kwargs):
             return step_outputs
 
-        return Step(step_name, step_input, lambda k: None, dummy_func, [], {}, step_outputs=step_outputs)
+        return Step(step_name, step_input, lambda k: None, dummy_func, [], {}, step_outputs=step_outputs,
+                    timing=timing, lineage=lineage, released=released)
 
     def step_output(self):
         return self._step_outputs
 
+    def timing(self):
+        return self._timing
+
+    def lineage(self):
+        return self._lineage
+
+    def record_lineage(self, lineage):
+        for output_file, input_files in lineage.items():
+            self._lineage[output_file] = list(input_files)
+
+    def released(self):
+        return self._released
+
+    def record_released(self, locations):
+        self._released.update(locations)
+
     def info(self):
         return {
             "name": self._step_name,
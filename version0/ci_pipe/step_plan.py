@@ -0,0 +1,105 @@
+import importlib
+import inspect
+import json
+
+from ci_pipe.content_hasher import ContentHasher
+from ci_pipe.disk_space_governor import DiskSpaceGovernor
+from ci_pipe.retention_policy import RetentionPolicy
+from ci_pipe.retry_policy import RetryPolicy
+from ci_pipe.task_executor import LocalTaskExecutor
+from ci_pipe.throughput_history import ThroughputHistory
+from ci_pipe.work_queue import WorkQueueExecutor
+from logger.event_bus import EventBus
+from logger.file_logger import FileLogger
+from utils import build_filesystem_path_from, is_content_available_in
+
+
+class StepPlan:
+    DEFAULT_PIPELINE = "isx_pipeline.isx_pipeline:ISXPipeline"
+    DEFAULT_TRACE_FILE = "trace.json"
+
+    def __init__(self, input_directory, output_directory, steps, executor=None):
+        self._input_directory = input_directory
+        self._output_directory = output_directory
+        self._steps = [(method, dict(params)) for method, params in steps]
+        self._executor = {"pipeline": self.DEFAULT_PIPELINE, "trace_file": self.DEFAULT_TRACE_FILE,
+                          **(executor or {})}
+
+    @classmethod
+    def from_dict(cls, data):
+        steps = [(step["step"], step["params"]) for step in data["steps"]]
+        return cls(data["input_directory"], data["output_directory"], steps, data["executor"])
+
+    def as_dict(self):
+        return {
+            "input_directory": self._input_directory,
+            "output_directory": self._output_directory,
+            "steps": [{"step": method, "params": params} for method, params in self._steps],
+            "executor": self._executor
+        }
+
+    def input_directory(self):
+        return self._input_directory
+
+    def output_directory(self):
+        return self._output_directory
+
+    def steps(self):
+        return self._steps
+
+    def executor(self):
+        return self._executor
+
+    def step_name(self, method, params):
+        if "name" in params:
+            return params["name"]
+        name_parameter = inspect.signature(getattr(self.pipeline_class(), method)).parameters.get("name")
+        if name_parameter is None or name_parameter.default is inspect.Parameter.empty:
+            return method
+        return name_parameter.default
+
+    def backend(self):
+        return WorkQueueExecutor.BACKEND if "work_queue" in self._executor else LocalTaskExecutor.BACKEND
+
+    def completed_step_names(self):
+        trace_path = build_filesystem_path_from(self._output_directory, self._executor["trace_file"])
+        if not is_content_available_in(trace_path):
+            return set()
+        with open(trace_path, "r", encoding="utf-8") as file:
+            return {step["algorithm"] for step in json.load(file).values()}
+
+    def pipeline_class(self):
+        return self.resolve_pipeline_class(self._executor["pipeline"])
+
+    @staticmethod
+    def resolve_pipeline_class(pipeline_path):
+        module_name, class_name = pipeline_path.split(":")
+        return getattr(importlib.import_module(module_name), class_name)
+
+    def build_pipeline(self):
+        logger = FileLogger.new_for(self._executor["trace_file"], self._output_directory)
+        return self.pipeline_class().new(self._input_directory, logger, **self.pipeline_options())
+
+    def pipeline_options(self):
+        options = {}
+        if "retry" in self._executor:
+            options["retry_policy"] = RetryPolicy(**self._executor["retry"])
+        if "events" in self._executor:
+            options["event_bus"] = EventBus.from_settings(self._output_directory, **self._executor["events"])
+        if "retention" in self._executor:
+            options["retention_policy"] = RetentionPolicy(**self._executor["retention"])
+        if "disk_space" in self._executor:
+            options["disk_space_governor"] = DiskSpaceGovernor(**self._executor["disk_space"])
+        if "deduplicate" in self._executor:
+            options["content_hasher"] = ContentHasher(**self._executor["deduplicate"])
+        if "work_queue" in self._executor:
+            options["task_executor"] = WorkQueueExecutor.from_settings(**self._executor["work_queue"])
+        if "history" in self._executor:
+            options["throughput_history"] = ThroughputHistory.new_for(**self._executor["history"])
+        return options
+
+    def run(self):
+        pipeline = self.build_pipeline()
+        for method, params in self._steps:
+            getattr(pipeline, method)(**params)
+        return pipeline
@@ -0,0 +1,21 @@
+class LocalTaskExecutor:
+    BACKEND = "local"
+
+    def __init__(self, task_runner):
+        self._task_runner = task_runner
+
+    def run(self, tasks, retry_policy, before_task=None, on_task_finished=None):
+        errors = []
+        for index, task in enumerate(tasks):
+            if before_task is not None:
+                before_task()
+            try:
+                retry_policy.run(lambda: self._task_runner(task["operation"], task["input_files"],
+                                                           task["output_files"], task["params"]))
+            except Exception as error:
+                errors.append(error)
+            else:
+                errors.append(None)
+            if on_task_finished is not None:
+                on_task_finished(index, errors[-1])
+        return errors
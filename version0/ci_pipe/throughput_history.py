@@ -0,0 +1,73 @@
+import os
+import sqlite3
+import time
+
+from utils import create_directory_from
+
+
+class ThroughputHistory:
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS samples (
+            step TEXT NOT NULL,
+            backend TEXT NOT NULL,
+            bytes INTEGER NOT NULL,
+            frames INTEGER,
+            seconds REAL NOT NULL,
+            recorded_at REAL NOT NULL,
+            output_bytes INTEGER,
+            output_frames INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS samples_by_step ON samples (step, backend, recorded_at);
+    """
+
+    def __init__(self, connection, window=20):
+        self._connection = connection
+        self._connection.row_factory = sqlite3.Row
+        self._connection.executescript(self.SCHEMA)
+        columns = {row["name"] for row in self._connection.execute("PRAGMA table_info(samples)")}
+        for column in ("output_bytes", "output_frames"):
+            if column not in columns:
+                self._connection.execute(f"ALTER TABLE samples ADD COLUMN {column} INTEGER")
+        self._window = window
+
+    @classmethod
+    def new_for(cls, database, window=20):
+        database = os.path.expanduser(database)
+        create_directory_from(os.path.dirname(os.path.abspath(database)))
+        return cls(sqlite3.connect(database, timeout=60), window)
+
+    def close(self):
+        self._connection.close()
+
+    def record(self, step, backend, processed_bytes, frames, seconds, output_bytes=None, output_frames=None):
+        if seconds <= 0:
+            return
+        with self._connection:
+            self._connection.execute(
+                "INSERT INTO samples (step, backend, bytes, frames, seconds, recorded_at, output_bytes, output_frames) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (step, backend, processed_bytes, frames, seconds, time.time(), output_bytes, output_frames))
+
+    def rate(self, step, backend):
+        # Rates over the most recent samples, so upgrades to hardware or isx show up quickly
+        rows = self._connection.execute(
+            "SELECT bytes, frames, seconds, output_bytes, output_frames FROM samples WHERE step = ? AND backend = ? "
+            "ORDER BY recorded_at DESC LIMIT ?", (step, backend, self._window)).fetchall()
+        if not rows:
+            return None
+        seconds = sum(row["seconds"] for row in rows)
+        frame_rows = [row for row in rows if row["frames"] is not None]
+        frame_seconds = sum(row["seconds"] for row in frame_rows)
+        return {
+            "bytes_per_second": sum(row["bytes"] for row in rows) / seconds,
+            "frames_per_second": sum(row["frames"] for row in frame_rows) / frame_seconds if frame_seconds else None,
+            "output_bytes_per_byte": self._ratio(rows, "output_bytes", "bytes"),
+            "output_frames_per_frame": self._ratio(rows, "output_frames", "frames")
+        }
+
+    def _ratio(self, rows, output_column, input_column):
+        # How much output a step writes per unit read, so the inputs of later steps can be projected
+        measured_rows = [row for row in rows if row[output_column] is not None and row[input_column]]
+        if not measured_rows:
+            return None
+        return sum(row[output_column] for row in measured_rows) / sum(row[input_column] for row in measured_rows)
@@ -4,6 +4,8 @@ from ci_pipe.step import Step
 
 
 class TraceBuilder:
+    TIMING_KEYS = ("started_at", "finished_at", "working_directory")
+
     @staticmethod
     def build_dictionary_trace_from(steps: List[Step]):
         trace = {}
@@ -11,9 +13,14 @@ class TraceBuilder:
             step_info = step.info()
             trace[str(step_index)] = {
                 "algorithm": step_info["name"],
-                "input": [item for v in step_info["input"].values() for item in v],
-                "output": [item for v in step_info["output"].values() for item in v]
+                "input": step_info["input"],
+                "output": step_info["output"],
+                **step.timing()
             }
+            if step.lineage():
+                trace[str(step_index)]["lineage"] = step.lineage()
+            if step.released():
+                trace[str(step_index)]["released"] = step.released()
         return trace
 
     @staticmethod
@@ -22,8 +29,29 @@ class TraceBuilder:
         for step_number in sorted(trace, key=lambda x: int(x)):
             step_data = trace[step_number]
             step_name = step_data["algorithm"]
-            step_input = {"input": step_data["input"]}
-            step_output = {"output": step_data["output"]}
-            step = Step.from_log(step_name, step_input, step_output)
+            step_input = TraceBuilder._keyed_files(step_data["input"], "input")
+            step_output = TraceBuilder._keyed_files(step_data["output"], "output")
+            timing = {key: step_data[key] for key in TraceBuilder.TIMING_KEYS if key in step_data}
+            step = Step.from_log(step_name, step_input, step_output, timing, step_data.get("lineage"),
+                                 step_data.get("released"))
             steps.append(step)
         return steps
+
+    @staticmethod
+    def files_of(trace_entry):
+        # Traces written before keys were recorded store a flat list of files
+        if isinstance(trace_entry, dict):
+            return [item for v in trace_entry.values() for item in v]
+        return list(trace_entry)
+
+    @staticmethod
+    def released_locations_in(trace: dict):
+        # Outputs released by the retention policy live on in their archive, or nowhere (None) once deleted
+        return {file: location for step_data in trace.values() for file, location in
+                step_data.get("released", {}).items()}
+
+    @staticmethod
+    def _keyed_files(trace_entry, legacy_key):
+        if isinstance(trace_entry, dict):
+            return {key: list(files) for key, files in trace_entry.items()}
+        return {legacy_key: list(trace_entry)}
@@ -0,0 +1,246 @@
+import json
+import os
+import sqlite3
+
+from ci_pipe.file_checkpoint import FileCheckpoint
+from ci_pipe.trace_builder import TraceBuilder
+from utils import create_directory_from
+
+
+class TraceCatalogue:
+    COMPLETED = "completed"
+    FAILED = "failed"
+    QUARANTINED = "quarantined"
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS scanned_files (
+            path TEXT PRIMARY KEY,
+            directory TEXT NOT NULL,
+            mtime REAL NOT NULL,
+            kind TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS steps (
+            trace_path TEXT NOT NULL,
+            directory TEXT NOT NULL,
+            step_index INTEGER NOT NULL,
+            algorithm TEXT NOT NULL,
+            status TEXT NOT NULL,
+            started_at REAL,
+            finished_at REAL,
+            seconds REAL
+        );
+        CREATE TABLE IF NOT EXISTS step_files (
+            trace_path TEXT NOT NULL,
+            step_index INTEGER NOT NULL,
+            role TEXT NOT NULL,
+            path TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS file_status (
+            checkpoint_path TEXT NOT NULL,
+            directory TEXT NOT NULL,
+            algorithm TEXT NOT NULL,
+            path TEXT NOT NULL,
+            status TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS steps_by_algorithm ON steps (algorithm, status);
+        CREATE INDEX IF NOT EXISTS steps_by_trace ON steps (trace_path, step_index);
+        CREATE INDEX IF NOT EXISTS step_files_by_path ON step_files (path);
+        CREATE INDEX IF NOT EXISTS step_files_by_trace ON step_files (trace_path, step_index);
+        CREATE INDEX IF NOT EXISTS file_status_by_path ON file_status (path, status);
+    """
+
+    # Traces only hold steps that finished, so step status comes from the checkpoint of the same folder: a traced
+    # step with quarantined files is quarantined, and a step with failed files that never reached the trace failed
+    STEPS_WITH_STATUS = """
+        SELECT trace_path, directory, step_index, algorithm,
+               CASE WHEN EXISTS (SELECT 1 FROM file_status WHERE file_status.directory = steps.directory
+                                 AND file_status.algorithm = steps.algorithm AND file_status.status = 'quarantined')
+                    THEN 'quarantined' ELSE 'completed' END AS status,
+               started_at, finished_at, seconds
+        FROM steps
+        UNION ALL
+        SELECT NULL, directory, NULL, algorithm, 'failed', NULL, NULL, NULL
+        FROM file_status
+        WHERE status = 'failed' AND NOT EXISTS (SELECT 1 FROM steps WHERE steps.directory = file_status.directory
+                                                AND steps.algorithm = file_status.algorithm)
+        GROUP BY directory, algorithm
+    """
+
+    def __init__(self, connection):
+        self._connection = connection
+        self._connection.row_factory = sqlite3.Row
+        self._connection.executescript(self.SCHEMA)
+
+    @classmethod
+    def new_for(cls, database_path):
+        create_directory_from(os.path.dirname(os.path.abspath(database_path)))
+        return cls(sqlite3.connect(database_path))
+
+    def close(self):
+        self._connection.close()
+
+    def update(self, root):
+        root = os.path.abspath(root)
+        known_mtimes = {row["path"]: row["mtime"] for row in self._connection.execute(
+            "SELECT path, mtime FROM scanned_files WHERE path LIKE ? ESCAPE '\\'", (self._under(root),))}
+        found_paths = set()
+        indexed_count = 0
+        with self._connection:
+            for path in self._json_files_under(root):
+                found_paths.add(path)
+                mtime = os.stat(path).st_mtime
+                if known_mtimes.get(path) == mtime:
+                    continue
+                self._forget(path)
+                self._index(path, mtime)
+                indexed_count += 1
+            for path in set(known_mtimes) - found_paths:
+                self._forget(path)
+        return indexed_count
+
+    def find_steps(self, algorithm=None, status=None, file=None, min_seconds=None, max_seconds=None,
+                   finished_after=None, finished_before=None):
+        conditions = []
+        parameters = []
+        for column, operator, value in (("algorithm", "=", algorithm), ("status", "=", status),
+                                         ("seconds", ">=", min_seconds), ("seconds", "<=", max_seconds),
+                                         ("finished_at", ">=", finished_after),
+                                         ("finished_at", "<=", finished_before)):
+            if value is not None:
+                conditions.append(f"steps.{column} {operator} ?")
+                parameters.append(value)
+        if file is not None:
+            conditions.append("(EXISTS (SELECT 1 FROM step_files WHERE step_files.trace_path = steps.trace_path "
+                              "AND step_files.step_index = steps.step_index AND step_files.path GLOB ?) OR "
+                              "EXISTS (SELECT 1 FROM file_status WHERE file_status.directory = steps.directory "
+                              "AND file_status.algorithm = steps.algorithm AND file_status.path GLOB ?))")
+            parameters.extend((file, file))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self._connection.execute(
+            f"SELECT * FROM ({self.STEPS_WITH_STATUS}) AS steps {where} "
+            "ORDER BY steps.directory, steps.step_index IS NULL, steps.step_index", parameters)
+        return [dict(row) for row in rows]
+
+    def find_files(self, pattern, role=None, algorithm=None):
+        conditions = ["step_files.path GLOB ?"]
+        parameters = [pattern]
+        if role is not None:
+            conditions.append("step_files.role = ?")
+            parameters.append(role)
+        if algorithm is not None:
+            conditions.append("steps.algorithm = ?")
+            parameters.append(algorithm)
+        rows = self._connection.execute(
+            "SELECT step_files.path, step_files.role, steps.trace_path, steps.directory, steps.step_index, "
+            "steps.algorithm FROM step_files JOIN steps ON step_files.trace_path = steps.trace_path "
+            f"AND step_files.step_index = steps.step_index WHERE {' AND '.join(conditions)} "
+            "ORDER BY steps.trace_path, steps.step_index", parameters)
+        return [dict(row) for row in rows]
+
+    def find_file_status(self, status=None, algorithm=None):
+        conditions = []
+        parameters = []
+        for column, value in (("status", status), ("algorithm", algorithm)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                parameters.append(value)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self._connection.execute(f"SELECT * FROM file_status {where} ORDER BY directory, path", parameters)
+        return [dict(row) for row in rows]
+
+    def rebuild_steps(self, trace_paths):
+        steps_by_trace = {}
+        for trace_path in trace_paths:
+            with open(trace_path, "r", encoding="utf-8") as file:
+                steps_by_trace[trace_path] = TraceBuilder.build_steps_from_trace(json.load(file))
+        return steps_by_trace
+
+    def _json_files_under(self, root):
+        for directory, _, filenames in os.walk(root):
+            for filename in filenames:
+                if filename.endswith(".json"):
+                    yield os.path.join(directory, filename)
+
+    def _under(self, root):
+        escaped_root = root.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        return f"{escaped_root}{os.sep}%"
+
+    def _forget(self, path):
+        for table, column in (("scanned_files", "path"), ("steps", "trace_path"), ("step_files", "trace_path"),
+                              ("file_status", "checkpoint_path")):
+            self._connection.execute(f"DELETE FROM {table} WHERE {column} = ?", (path,))
+
+    def _index(self, path, mtime):
+        directory = os.path.dirname(path)
+        content = self._read_json(path)
+        if os.path.basename(path) == FileCheckpoint.FILENAME and isinstance(content, dict):
+            kind = "checkpoint"
+            self._index_checkpoint(path, directory, content)
+        elif self._is_trace(content):
+            kind = "trace"
+            self._index_trace(path, directory, content)
+        else:
+            kind = "other"
+        self._connection.execute("INSERT INTO scanned_files (path, directory, mtime, kind) VALUES (?, ?, ?, ?)",
+                                 (path, directory, mtime, kind))
+
+    def _read_json(self, path):
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def _is_trace(self, content):
+        return (isinstance(content, dict) and len(content) > 0 and
+                all(key.isdigit() and isinstance(step, dict) and "algorithm" in step for key, step in content.items()))
+
+    def _index_trace(self, path, directory, trace):
+        released_locations = TraceBuilder.released_locations_in(trace)
+        for step_number, step_data in trace.items():
+            working_directory = step_data.get("working_directory")
+            started_at = step_data.get("started_at")
+            finished_at = step_data.get("finished_at")
+            seconds = finished_at - started_at if started_at is not None and finished_at is not None else None
+            self._connection.execute(
+                "INSERT INTO steps (trace_path, directory, step_index, algorithm, status, started_at, finished_at, "
+                "seconds) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (path, directory, int(step_number), step_data["algorithm"], self.COMPLETED, started_at, finished_at,
+                 seconds))
+            self._connection.executemany(
+                "INSERT INTO step_files (trace_path, step_index, role, path) VALUES (?, ?, ?, ?)",
+                [(path, int(step_number), role, self._resolved(released_locations.get(file, file), working_directory))
+                 for role in ("input", "output") for file in TraceBuilder.files_of(step_data.get(role, []))
+                 if released_locations.get(file, file) is not None])
+
+    def _index_checkpoint(self, path, directory, checkpoint):
+        working_directory = self._working_directory_of(directory)
+        rows = []
+        for algorithm, step in checkpoint.items():
+            rows.extend((path, directory, algorithm, self._resolved(file, working_directory), self.COMPLETED)
+                        for file in step.get("completed", {}))
+            rows.extend((path, directory, algorithm, self._resolved(file, working_directory), self.FAILED)
+                        for file in step.get("failed", {}) if file not in step.get("quarantined", []))
+            rows.extend((path, directory, algorithm, self._resolved(file, working_directory), self.QUARANTINED)
+                        for file in step.get("quarantined", []))
+        self._connection.executemany(
+            "INSERT INTO file_status (checkpoint_path, directory, algorithm, path, status) VALUES (?, ?, ?, ?, ?)",
+            rows)
+
+    def _working_directory_of(self, directory):
+        # Checkpoints name files the way the pipeline did; the trace next to them records where it ran
+        for filename in sorted(os.listdir(directory)):
+            if not filename.endswith(".json") or filename == FileCheckpoint.FILENAME:
+                continue
+            content = self._read_json(os.path.join(directory, filename))
+            if self._is_trace(content):
+                for step_data in content.values():
+                    if step_data.get("working_directory") is not None:
+                        return step_data["working_directory"]
+        return None
+
+    def _resolved(self, file, working_directory):
+        # Traces written before the working directory was recorded keep their paths as written
+        if working_directory is None or os.path.isabs(file):
+            return file
+        return os.path.normpath(os.path.join(working_directory, file))
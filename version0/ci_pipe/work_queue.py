@@ -0,0 +1,260 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+from utils import create_directory_from
+
+
+class WorkQueue:
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    DEFAULT_LEASE_SECONDS = 300.0
+    LEASE_EXPIRED_ERROR = "Worker stopped renewing its lease"
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            batch TEXT NOT NULL,
+            operation TEXT NOT NULL,
+            input_files TEXT NOT NULL,
+            output_files TEXT NOT NULL,
+            params TEXT NOT NULL,
+            status TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL,
+            retry_delays TEXT NOT NULL,
+            available_at REAL NOT NULL,
+            worker TEXT,
+            error TEXT,
+            started_at REAL,
+            finished_at REAL,
+            lease_expires_at REAL
+        );
+        CREATE INDEX IF NOT EXISTS tasks_by_status ON tasks (status, available_at);
+        CREATE INDEX IF NOT EXISTS tasks_by_batch ON tasks (batch, status);
+    """
+
+    def __init__(self, connection, lease_seconds=DEFAULT_LEASE_SECONDS):
+        self._connection = connection
+        self._connection.row_factory = sqlite3.Row
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(self.SCHEMA)
+        columns = {row["name"] for row in self._connection.execute("PRAGMA table_info(tasks)")}
+        if "lease_expires_at" not in columns:
+            self._connection.execute("ALTER TABLE tasks ADD COLUMN lease_expires_at REAL")
+        self._lease_seconds = lease_seconds
+
+    @classmethod
+    def new_for(cls, database_path, lease_seconds=DEFAULT_LEASE_SECONDS):
+        create_directory_from(os.path.dirname(os.path.abspath(database_path)))
+        # isolation_level=None lets claim() control its own write transaction
+        return cls(sqlite3.connect(database_path, timeout=60, isolation_level=None), lease_seconds)
+
+    def lease_seconds(self):
+        return self._lease_seconds
+
+    def close(self):
+        self._connection.close()
+
+    def submit(self, tasks, max_attempts=1, retry_delays=(), batch=None):
+        batch = batch or uuid.uuid4().hex
+        now = time.time()
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            self._connection.executemany(
+                "INSERT INTO tasks (batch, operation, input_files, output_files, params, status, max_attempts, "
+                "retry_delays, available_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(batch, task["operation"], json.dumps(task["input_files"]), json.dumps(task["output_files"]),
+                  json.dumps(task["params"]), self.PENDING, max_attempts, json.dumps(list(retry_delays)), now)
+                 for task in tasks])
+            self._connection.execute("COMMIT")
+        except Exception:
+            self._connection.execute("ROLLBACK")
+            raise
+        return batch
+
+    def claim(self, worker):
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            self._reclaim_expired_leases()
+            now = time.time()
+            row = self._connection.execute(
+                "SELECT * FROM tasks WHERE status = ? AND available_at <= ? ORDER BY id LIMIT 1",
+                (self.PENDING, now)).fetchone()
+            if row is not None:
+                self._connection.execute(
+                    "UPDATE tasks SET status = ?, worker = ?, attempts = attempts + 1, started_at = ?, "
+                    "lease_expires_at = ? WHERE id = ?",
+                    (self.RUNNING, worker, now, now + self._lease_seconds, row["id"]))
+            self._connection.execute("COMMIT")
+        except Exception:
+            self._connection.execute("ROLLBACK")
+            raise
+        if row is None:
+            return None
+        return {"id": row["id"], "attempt": row["attempts"] + 1, "operation": row["operation"],
+                "input_files": json.loads(row["input_files"]), "output_files": json.loads(row["output_files"]),
+                "params": json.loads(row["params"])}
+
+    def renew(self, task_id, attempt):
+        self._connection.execute("UPDATE tasks SET lease_expires_at = ? WHERE id = ? AND attempts = ? AND status = ?",
+                                 (time.time() + self._lease_seconds, task_id, attempt, self.RUNNING))
+
+    def reclaim_expired_leases(self):
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            self._reclaim_expired_leases()
+            self._connection.execute("COMMIT")
+        except Exception:
+            self._connection.execute("ROLLBACK")
+            raise
+
+    def complete(self, task_id, attempt=None):
+        # The attempt a task was claimed with fences off late results from a worker whose lease was reclaimed
+        self._connection.execute(
+            "UPDATE tasks SET status = ?, error = NULL, finished_at = ? WHERE id = ? AND status = ? "
+            "AND attempts = COALESCE(?, attempts)", (self.DONE, time.time(), task_id, self.RUNNING, attempt))
+
+    def fail(self, task_id, error, attempt=None):
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            self._fail(task_id, error, attempt)
+            self._connection.execute("COMMIT")
+        except Exception:
+            self._connection.execute("ROLLBACK")
+            raise
+
+    def _fail(self, task_id, error, attempt):
+        row = self._connection.execute(
+            "SELECT attempts, max_attempts, retry_delays FROM tasks WHERE id = ? AND status = ? "
+            "AND attempts = COALESCE(?, attempts)", (task_id, self.RUNNING, attempt)).fetchone()
+        if row is None:
+            return
+        # Fence on the attempt read above so a concurrent reclaim and claim cannot be overwritten
+        retry_delays = json.loads(row["retry_delays"])
+        if row["attempts"] < row["max_attempts"]:
+            delay = retry_delays[row["attempts"] - 1] if row["attempts"] - 1 < len(retry_delays) else 0
+            self._connection.execute(
+                "UPDATE tasks SET status = ?, error = ?, available_at = ? WHERE id = ? AND attempts = ? "
+                "AND status = ?", (self.PENDING, error, time.time() + delay, task_id, row["attempts"], self.RUNNING))
+        else:
+            self._connection.execute(
+                "UPDATE tasks SET status = ?, error = ?, finished_at = ? WHERE id = ? AND attempts = ? "
+                "AND status = ?", (self.FAILED, error, time.time(), task_id, row["attempts"], self.RUNNING))
+
+    def _reclaim_expired_leases(self):
+        # A worker that crashed or lost the shared filesystem stops renewing; its attempt counts as a failure
+        expired = self._connection.execute(
+            "SELECT id, worker FROM tasks WHERE status = ? AND lease_expires_at <= ?",
+            (self.RUNNING, time.time())).fetchall()
+        for row in expired:
+            self._fail(row["id"], f"{self.LEASE_EXPIRED_ERROR}: {row['worker']}", None)
+
+    def results(self, batch):
+        rows = self._connection.execute(
+            "SELECT id, status, error, worker FROM tasks WHERE batch = ? ORDER BY id", (batch,))
+        return [dict(row) for row in rows]
+
+    def is_finished(self, batch):
+        row = self._connection.execute("SELECT COUNT(*) AS unfinished FROM tasks WHERE batch = ? AND status IN (?, ?)",
+                                       (batch, self.PENDING, self.RUNNING)).fetchone()
+        return row["unfinished"] == 0
+
+
+class WorkQueueWorker:
+    def __init__(self, work_queue, task_runner, worker=None, poll_seconds=1.0, sleep=time.sleep):
+        self._work_queue = work_queue
+        self._task_runner = task_runner
+        self._worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+        self._poll_seconds = poll_seconds
+        self._sleep = sleep
+
+    def run_once(self):
+        task = self._work_queue.claim(self._worker)
+        if task is None:
+            return False
+        errors = []
+
+        def run_task():
+            try:
+                self._task_runner(task["operation"], task["input_files"], task["output_files"], task["params"])
+            except Exception as error:
+                errors.append(error)
+
+        # The task runs on its own thread so this one keeps the lease alive for as long as the task takes
+        runner = threading.Thread(target=run_task, name=f"work-queue-task-{task['id']}", daemon=True)
+        runner.start()
+        renew_seconds = max(self._work_queue.lease_seconds() / 3, 0.01)
+        while runner.is_alive():
+            runner.join(renew_seconds)
+            if runner.is_alive():
+                self._work_queue.renew(task["id"], task["attempt"])
+        if errors:
+            self._work_queue.fail(task["id"], repr(errors[0]), task["attempt"])
+        else:
+            self._work_queue.complete(task["id"], task["attempt"])
+        return True
+
+    def run(self, stop_when_idle=False, should_stop=None):
+        while should_stop is None or not should_stop():
+            if not self.run_once():
+                if stop_when_idle:
+                    return
+                self._sleep(self._poll_seconds)
+
+
+class WorkQueueExecutor:
+    BACKEND = "work_queue"
+    TASK_FAILED_ERROR = "Work queue task failed"
+    TIMEOUT_ERROR = "Timed out waiting for work queue tasks"
+
+    def __init__(self, work_queue, poll_seconds=2.0, timeout_seconds=None, max_in_flight=8, sleep=time.sleep):
+        self._work_queue = work_queue
+        self._poll_seconds = poll_seconds
+        self._timeout_seconds = timeout_seconds
+        self._max_in_flight = max_in_flight
+        self._sleep = sleep
+
+    @classmethod
+    def from_settings(cls, database, poll_seconds=2.0, timeout_seconds=None, max_in_flight=8):
+        return cls(WorkQueue.new_for(database), poll_seconds, timeout_seconds, max_in_flight)
+
+    def run(self, tasks, retry_policy, before_task=None, on_task_finished=None):
+        if not tasks:
+            return []
+        batch = None
+        errors = [None] * len(tasks)
+        reported = set()
+        submitted_count = 0
+        waited_seconds = 0.0
+        while True:
+            # Tasks are fed a few at a time so before_task (e.g. the disk-space governor) gates each one
+            while submitted_count < len(tasks) and submitted_count - len(reported) < self._max_in_flight:
+                if before_task is not None:
+                    before_task()
+                batch = self._work_queue.submit([tasks[submitted_count]], retry_policy.max_attempts(),
+                                                retry_policy.delays(), batch)
+                submitted_count += 1
+            self._work_queue.reclaim_expired_leases()
+            for index, result in enumerate(self._work_queue.results(batch)):
+                if index in reported or result["status"] not in (WorkQueue.DONE, WorkQueue.FAILED):
+                    continue
+                reported.add(index)
+                if result["status"] == WorkQueue.FAILED:
+                    errors[index] = RuntimeError(f"{self.TASK_FAILED_ERROR}: {result['error']}")
+                if on_task_finished is not None:
+                    on_task_finished(index, errors[index])
+            if len(reported) == len(tasks):
+                return errors
+            if submitted_count < len(tasks) and submitted_count - len(reported) < self._max_in_flight:
+                continue
+            if self._timeout_seconds is not None and waited_seconds >= self._timeout_seconds:
+                raise TimeoutError(f"{self.TIMEOUT_ERROR}: batch {batch}")
+            self._sleep(self._poll_seconds)
+            waited_seconds += self._poll_seconds
@@ -0,0 +1,173 @@
+import argparse
+import json
+import os
+import sys
+
+from ci_pipe.dry_run_planner import DryRunPlanner
+from ci_pipe.file_checkpoint import FileCheckpoint
+from ci_pipe.pipeline_spec import PlanCache
+from ci_pipe.progress import ProgressEstimator
+from ci_pipe.throughput_history import ThroughputHistory
+from ci_pipe.trace_catalogue import TraceCatalogue
+from ci_pipe.work_queue import WorkQueue, WorkQueueWorker
+from isx_pipeline.isx_tasks import run_task
+from isx_pipeline.isxd_header import isxd_frame_count
+from lazy_module import LazyModule
+
+DEFAULT_CACHE_DIRECTORY = os.path.join(os.path.expanduser("~"), ".cache", "ci_pipe", "plans")
+DEFAULT_CATALOGUE_DATABASE = os.path.join(os.path.expanduser("~"), ".cache", "ci_pipe", "traces.sqlite")
+DEFAULT_HISTORY_DATABASE = os.path.join(os.path.expanduser("~"), ".cache", "ci_pipe", "throughput.sqlite")
+
+
+def run_command(arguments):
+    plan = PlanCache(arguments.cache_dir).plan_for(arguments.spec)
+    if arguments.dry_run:
+        history = ThroughputHistory.new_for(history_database_of(plan))
+        try:
+            print(json.dumps(DryRunPlanner(plan, history).plan(), indent=4))
+        finally:
+            history.close()
+        return 0
+    pipeline = plan.run()
+    if hasattr(pipeline, "reclaimed_bytes"):
+        print(f"Reclaimed {pipeline.reclaimed_bytes()} bytes of intermediate outputs")
+    return 0
+
+
+def history_database_of(plan):
+    return plan.executor().get("history", {}).get("database", DEFAULT_HISTORY_DATABASE)
+
+
+def estimate_command(arguments):
+    plan = PlanCache(arguments.cache_dir).plan_for(arguments.spec)
+    history = ThroughputHistory.new_for(arguments.history or history_database_of(plan))
+    try:
+        estimator = ProgressEstimator(history, plan.backend(), isxd_frame_count)
+        input_files = plan.pipeline_class().input_files_in(plan.input_directory())
+        estimate = estimator.estimate_plan(plan, input_files, plan.completed_step_names())
+    finally:
+        history.close()
+    print(json.dumps(estimate))
+    return 0
+
+
+def progress_command(arguments):
+    latest_by_step = {}
+    with open(arguments.events, "r", encoding="utf-8") as file:
+        for line in file:
+            event = json.loads(line)
+            if "files_total" in event:
+                latest_by_step[event["step"]] = event
+    for step_name, event in latest_by_step.items():
+        print(json.dumps({"step": step_name, **{key: event[key] for key in (
+            "files_done", "files_total", "bytes_done", "bytes_total", "elapsed_seconds", "eta_seconds")}}))
+    return 0
+
+
+def release_quarantine_command(arguments):
+    FileCheckpoint.new_for(arguments.output_directory).release_quarantine(arguments.step, arguments.file)
+    print(f"Released {arguments.file} from quarantine in '{arguments.step}'")
+    return 0
+
+
+def catalogue_command(arguments):
+    catalogue = TraceCatalogue.new_for(arguments.database)
+    try:
+        if arguments.catalogue_command == "update":
+            rows = [{"root": root, "indexed": catalogue.update(root)} for root in arguments.roots]
+        elif arguments.catalogue_command == "steps":
+            rows = catalogue.find_steps(algorithm=arguments.algorithm, status=arguments.status, file=arguments.file)
+        elif arguments.catalogue_command == "files-status":
+            rows = catalogue.find_file_status(status=arguments.status, algorithm=arguments.algorithm)
+        else:
+            rows = catalogue.find_files(arguments.pattern, role=arguments.role, algorithm=arguments.algorithm)
+    finally:
+        catalogue.close()
+    for row in rows:
+        print(json.dumps(row))
+    return 0
+
+
+def worker_command(arguments):
+    isx = LazyModule("isx")
+    work_queue = WorkQueue.new_for(arguments.queue, arguments.lease_seconds)
+    worker = WorkQueueWorker(work_queue, lambda operation, input_files, output_files, params: run_task(
+        isx, operation, input_files, output_files, params), poll_seconds=arguments.poll_seconds)
+    try:
+        worker.run(stop_when_idle=arguments.exit_when_idle)
+    finally:
+        work_queue.close()
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="ci_pipe", description="Run calcium imaging pipelines from spec files.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run the pipeline described by a YAML, JSON or TOML spec file.")
+    run_parser.add_argument("spec", help="Path to the pipeline spec file.")
+    run_parser.add_argument("--cache-dir", default=os.environ.get("CI_PIPE_CACHE_DIR", DEFAULT_CACHE_DIRECTORY),
+                            help="Directory where compiled step plans are cached.")
+    run_parser.add_argument("--dry-run", action="store_true",
+                            help="Only report the steps and files that would be skipped, recomputed or computed.")
+    run_parser.set_defaults(handler=run_command)
+
+    estimate_parser = subparsers.add_parser("estimate", help="Estimate how long the steps left in a spec will take.")
+    estimate_parser.add_argument("spec", help="Path to the pipeline spec file.")
+    estimate_parser.add_argument("--cache-dir", default=os.environ.get("CI_PIPE_CACHE_DIR", DEFAULT_CACHE_DIRECTORY),
+                                 help="Directory where compiled step plans are cached.")
+    estimate_parser.add_argument("--history", help="SQLite throughput history, defaults to executor.history.")
+    estimate_parser.set_defaults(handler=estimate_command)
+
+    progress_parser = subparsers.add_parser("progress", help="Show the latest progress of each step in an events file.")
+    progress_parser.add_argument("events", help="JSON lines events file written by the pipeline.")
+    progress_parser.set_defaults(handler=progress_command)
+
+    release_parser = subparsers.add_parser("release-quarantine",
+                                           help="Let a quarantined file be retried when the pipeline is resumed.")
+    release_parser.add_argument("output_directory", help="Pipeline output folder holding checkpoint.json.")
+    release_parser.add_argument("step", help="Step name, as listed by ISXPipeline.quarantined_files().")
+    release_parser.add_argument("file", help="Quarantined input file, exactly as recorded in the checkpoint.")
+    release_parser.set_defaults(handler=release_quarantine_command)
+
+    worker_parser = subparsers.add_parser("worker", help="Process per-file tasks from a shared work queue.")
+    worker_parser.add_argument("queue", help="SQLite work queue database shared with the pipeline.")
+    worker_parser.add_argument("--poll-seconds", type=float, default=1.0)
+    worker_parser.add_argument("--lease-seconds", type=float, default=WorkQueue.DEFAULT_LEASE_SECONDS,
+                               help="Tasks of a worker that stops renewing for this long are handed to others.")
+    worker_parser.add_argument("--exit-when-idle", action="store_true", help="Stop once no task is available.")
+    worker_parser.set_defaults(handler=worker_command)
+
+    catalogue_parser = subparsers.add_parser("catalogue", help="Index and query pipeline traces.")
+    catalogue_parser.add_argument("--database", default=os.environ.get("CI_PIPE_CATALOGUE", DEFAULT_CATALOGUE_DATABASE),
+                                  help="SQLite database holding the trace index.")
+    catalogue_parser.set_defaults(handler=catalogue_command)
+    catalogue_subparsers = catalogue_parser.add_subparsers(dest="catalogue_command", required=True)
+    update_parser = catalogue_subparsers.add_parser("update", help="Index new or modified traces under roots.")
+    update_parser.add_argument("roots", nargs="+")
+    steps_parser = catalogue_subparsers.add_parser("steps", help="List indexed steps.")
+    steps_parser.add_argument("--algorithm")
+    steps_parser.add_argument("--status", choices=[TraceCatalogue.COMPLETED, TraceCatalogue.FAILED,
+                                                   TraceCatalogue.QUARANTINED],
+                              help="Quarantined steps finished without some files; failed steps never finished.")
+    steps_parser.add_argument("--file", help="Only steps reading or writing files matching this glob.")
+    files_parser = catalogue_subparsers.add_parser("files", help="List indexed files matching a glob.")
+    files_parser.add_argument("pattern")
+    files_parser.add_argument("--role", choices=["input", "output"])
+    files_parser.add_argument("--algorithm")
+    files_status_parser = catalogue_subparsers.add_parser("files-status",
+                                                          help="List per-file status recorded in checkpoints.")
+    files_status_parser.add_argument("--status", choices=[TraceCatalogue.COMPLETED, TraceCatalogue.FAILED,
+                                                          TraceCatalogue.QUARANTINED])
+    files_status_parser.add_argument("--algorithm")
+
+    return parser
+
+
+def main(argv=None):
+    arguments = build_parser().parse_args(argv)
+    return arguments.handler(arguments)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,36 +1,133 @@
-import importlib
 import json
 import os
-import shutil
+import time
 from typing import ClassVar, Any
 
+from ci_pipe.file_checkpoint import FileCheckpoint
+from ci_pipe.lineage_index import LineageIndex
 from ci_pipe.pipeline import CIPipe
+from ci_pipe.progress import ProgressEstimator, StepProgress
+from ci_pipe.retention_policy import RetentionPolicy
+from ci_pipe.retry_policy import RetryPolicy
+from ci_pipe.task_executor import LocalTaskExecutor
 from ci_pipe.trace_builder import TraceBuilder
+from isx_pipeline.isx_tasks import run_task
+from isx_pipeline.isxd_header import isxd_frame_count
+from lazy_module import LazyModule
+from logger.event_bus import EventBus
+from logger.file_logger import FileLogger
 from utils import build_filesystem_path_from, create_directory_from, list_directory_contents, last_part_of_path, \
     is_content_available_in
 
 
 class ISXPipeline(CIPipe):
     INVALID_INPUT_DIRECTORY_ERROR = "Cannot create new pipeline with different input data in already created output directory"
-    isx_package: ClassVar[Any] = importlib.import_module("isx")
+    FAILED_FILES_ERROR = "Some files failed and will be retried when the pipeline is resumed"
+    HASHES_FILENAME = "hashes.json"
+    isx_package: ClassVar[Any] = LazyModule("isx")
+    # Input key each step reads and output key it writes, so runs can be planned without executing them
+    STEP_FILES: ClassVar[dict] = {
+        "preprocess_videos": ("videos", "videos"),
+        "bandpass_filter_videos": ("videos", "videos"),
+        "motion_correction_videos": ("videos", "videos"),
+        "normalize_dff_videos": ("videos", "videos"),
+        "extract_neurons_pca_ica": ("videos", "cellsets"),
+        "detect_events_in_cells": ("cellsets", "events"),
+        "auto_accept_reject_cells": ("cellsets", "cellsets"),
+    }
+    # Suffix each step appends to the names of the files it writes; None copies them under the same name
+    STEP_SUFFIXES: ClassVar[dict] = {
+        "preprocess_videos": "PP",
+        "bandpass_filter_videos": "BP",
+        "motion_correction_videos": "MC",
+        "normalize_dff_videos": "DFF",
+        "extract_neurons_pca_ica": "PCA-ICA",
+        "detect_events_in_cells": "ED",
+        "auto_accept_reject_cells": None,
+    }
+    # Methods a pipeline spec may list as steps
+    STEPS: ClassVar[tuple] = tuple(STEP_FILES)
 
-    def __init__(self, inputs, logger):
+    def __init__(self, inputs, logger, isx_package=None, retry_policy=None, event_bus=None, retention_policy=None,
+                 disk_space_governor=None, duplicate_inputs=None, task_executor=None, throughput_history=None,
+                 shared_inputs=None):
         super().__init__(inputs)
-        self._isx = self.__class__.isx_package
+        self._isx = isx_package if isx_package is not None else self.__class__.isx_package
         self._logger = logger
         self._output_folder = self._logger.directory()
+        self._retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self._events = event_bus if event_bus is not None else EventBus.default()
+        self._retention_policy = retention_policy if retention_policy is not None else RetentionPolicy()
+        self._disk_space_governor = disk_space_governor
+        self._task_executor = task_executor if task_executor is not None else LocalTaskExecutor(
+            lambda operation, input_files, output_files, params: run_task(self._isx, operation, input_files,
+                                                                          output_files, params))
+        self._step_lineage = {}
+        self._reclaimed_bytes = 0
+        self._duplicate_inputs = duplicate_inputs if duplicate_inputs is not None else {}
+        for canonical, duplicates in self._duplicate_inputs.items():
+            for duplicate in duplicates:
+                self._events.emit(EventBus.DUPLICATE_INPUT, file=duplicate, same_as=canonical)
+        self._shared_inputs = shared_inputs if shared_inputs is not None else {}
+        for file, canonical in self._shared_inputs.items():
+            self._events.emit(EventBus.DUPLICATE_INPUT, file=file, same_as=canonical["file"],
+                              trace=canonical["trace_path"])
+        self._throughput_history = throughput_history
+        self._progress_estimator = ProgressEstimator(throughput_history, self._task_executor.BACKEND, isxd_frame_count)
+        self._progress = None
+        self._checkpoint = FileCheckpoint.new_for(self._output_folder)
+        self._released_files = set()
         self._steps = []
         self._completed_step_names = set()
         if not self._logger.is_empty():
-            self._steps = TraceBuilder.build_steps_from_trace(self._logger.read_json_from_file())
+            self._steps = self._steps_before_released_files(
+                TraceBuilder.build_steps_from_trace(self._logger.read_json_from_file()))
             self._completed_step_names = set(step.info()["name"] for step in self._steps)
+            self._released_files = {file for step in self._steps for file in step.released()}
 
     @classmethod
-    def new(cls, input_directory, logger):
+    def new(cls, input_directory, logger, isx_package=None, retry_policy=None, event_bus=None, retention_policy=None,
+            disk_space_governor=None, content_hasher=None, task_executor=None, throughput_history=None):
         if not is_content_available_in(input_directory) and is_content_available_in(logger.directory()):
             raise ValueError(cls.INVALID_INPUT_DIRECTORY_ERROR)
         inputs = cls._scan_files(input_directory)
-        return cls(inputs, logger)
+        duplicate_inputs = {}
+        shared_inputs = {}
+        if content_hasher is not None:
+            duplicate_inputs, shared_inputs = cls._duplicate_inputs_in(inputs["videos"], logger, content_hasher)
+            duplicates = {duplicate for duplicates in duplicate_inputs.values() for duplicate in duplicates}
+            inputs = {"videos": [video for video in inputs["videos"]
+                                 if video not in duplicates and video not in shared_inputs]}
+        return cls(inputs, logger, isx_package, retry_policy, event_bus, retention_policy, disk_space_governor,
+                   duplicate_inputs, task_executor, throughput_history, shared_inputs)
+
+    @classmethod
+    def _duplicate_inputs_in(cls, files, logger, content_hasher):
+        hashes_logger = FileLogger.new_for(cls.HASHES_FILENAME, logger.directory())
+        hashes = hashes_logger.read_json_from_file()
+        duplicate_inputs = content_hasher.duplicates_in(files, hashes)
+        duplicates = {duplicate for duplicates in duplicate_inputs.values() for duplicate in duplicates}
+        trace_path = os.path.abspath(logger.filepath())
+        shared_inputs = {}
+        for file, canonical in content_hasher.shared_duplicates_in(
+                [file for file in files if file not in duplicates], hashes, trace_path).items():
+            outputs = cls._outputs_derived_from(canonical["file"], canonical["trace_path"])
+            if outputs:
+                shared_inputs[file] = {"file": canonical["file"], "trace_path": canonical["trace_path"],
+                                       "outputs": outputs}
+            else:
+                # The session that registered it never produced outputs for it, so this one processes it instead
+                content_hasher.claim(canonical, file, trace_path)
+        hashes_logger.write_json_to_file(hashes)
+        return duplicate_inputs, shared_inputs
+
+    @classmethod
+    def _outputs_derived_from(cls, file, trace_path):
+        if not is_content_available_in(trace_path):
+            return []
+        with open(trace_path, "r", encoding="utf-8") as trace_file:
+            steps = TraceBuilder.build_steps_from_trace(json.load(trace_file))
+        return sorted(LineageIndex.from_steps(steps).descendants_of(file))
 
     @classmethod
     def _scan_files(cls, input_folder: str):
@@ -41,54 +138,104 @@ class ISXPipeline(CIPipe):
 
     def step(self, step_name, step_function, *args):
         if step_name in self._completed_step_names:
-            return None
+            self._events.emit(EventBus.STEP_SKIPPED, step=step_name)
+            return self
         step_folder_path = self._step_folder_path(step_name)
         create_directory_from(step_folder_path)
 
-        result = super().step(step_name, step_function, *args)
+        started_at = time.monotonic()
+        self._step_lineage = {}
+        self._events.emit(EventBus.STEP_STARTED, step=step_name, folder=step_folder_path)
+        try:
+            result = super().step(step_name, step_function, *args)
+        except Exception as error:
+            self._events.emit(EventBus.STEP_FAILED, step=step_name, error=repr(error))
+            self._events.flush()
+            raise
+        self._steps[-1].record_lineage(self._step_lineage)
         self._update_trace()
         self._completed_step_names.add(step_name)
+        self._release_intermediate_files(step_name)
+        self._events.emit(EventBus.STEP_FINISHED, step=step_name, seconds=round(time.monotonic() - started_at, 3))
+        self._events.flush()
         return result
 
     def trace(self):
         self._logger.read_json_from_file()
 
+    def quarantined_files(self):
+        return self._checkpoint.quarantined_files()
+
+    def reclaimed_bytes(self):
+        return self._reclaimed_bytes
+
+    def lineage(self):
+        return LineageIndex.from_steps(self._steps)
+
+    def released_files(self):
+        return {file: location for step in self._steps for file, location in step.released().items()}
+
+    def duplicate_inputs(self):
+        return self._duplicate_inputs
+
+    def shared_inputs(self):
+        return self._shared_inputs
+
+    def progress(self):
+        if self._progress is None:
+            return None
+        return {"step": self._progress.step_name(), **self._progress.snapshot()}
+
+    @classmethod
+    def input_files_in(cls, input_directory):
+        return [file for files in cls._scan_files(input_directory).values() for file in files]
+
     def preprocess_videos(self, name="Preprocess Videos"):
         def wrapped_step(input):
-            input_output_pairs = self._input_and_output_files(input, 'videos', name, 'PP')
-            self._process_input_output_pairs(input_output_pairs, self._isx.preprocess)
-            return {'videos': [out_file for _, out_file in input_output_pairs]}
+            input_output_pairs = self._input_and_output_files(input, 'videos', name, self.STEP_SUFFIXES['preprocess_videos'])
+            completed_pairs = self._process_input_output_pairs(name, input_output_pairs, 'preprocess')
+            return {'videos': [out_file for _, out_file in completed_pairs]}
 
         return self.step(name, lambda input: wrapped_step(input))
 
     def bandpass_filter_videos(self, name="Bandpass Filter Videos"):
         def wrapped_step(input):
-            input_output_pairs = self._input_and_output_files(input, 'videos', name, 'BP')
-            self._process_input_output_pairs(input_output_pairs, lambda i, o: self._isx.spatial_filter(i, o, low_cutoff=0.005, high_cutoff=0.5))
-            return {'videos': [out_file for _, out_file in input_output_pairs]}
+            input_output_pairs = self._input_and_output_files(input, 'videos', name, self.STEP_SUFFIXES['bandpass_filter_videos'])
+            completed_pairs = self._process_input_output_pairs(name, input_output_pairs, 'spatial_filter', lambda i, o: {'low_cutoff': 0.005, 'high_cutoff': 0.5})
+            return {'videos': [out_file for _, out_file in completed_pairs]}
 
         return self.step(name, lambda input: wrapped_step(input))
 
     def motion_correction_videos(self, name="Motion Correction Videos", series_name="series"):
         def wrapped_step(input):
-            input_output_pairs = self._input_and_output_files(input, 'videos', name, 'MC')
+            input_output_pairs = self._input_and_output_files(input, 'videos', name, self.STEP_SUFFIXES['motion_correction_videos'])
             step_folder = self._step_folder_path(name)
-            mc_files = []
-            translation_files = []
-            mean_proj_files = []
-            crop_rect_files = []
-            for in_file, out_file in input_output_pairs:
+
+            def motion_correction_files(in_file, out_file):
                 video_name = os.path.splitext(os.path.basename(in_file))[0]
                 mean_proj_file = os.path.join(step_folder, f'{video_name}-{series_name}-mean_image.isxd')
                 crop_rect_file = os.path.join(step_folder, f'{video_name}-{series_name}-crop_rect.csv')
                 translation_file = self._isx.make_output_file_paths([out_file], step_folder, 'translations', 'csv')[0]
-                self._isx.project_movie([in_file], mean_proj_file, stat_type='mean')
-                self._isx.motion_correct([in_file], [out_file], max_translation=20, reference_file_name=mean_proj_file,
-                                     output_translation_files=[translation_file], output_crop_rect_file=crop_rect_file)
-                mc_files.append(out_file)
+                return out_file, translation_file, crop_rect_file, mean_proj_file
+
+            def motion_correction_params(in_file, out_file):
+                _, translation_file, crop_rect_file, mean_proj_file = motion_correction_files(in_file, out_file)
+                return {'mean_proj_file': os.path.abspath(mean_proj_file),
+                        'translation_file': os.path.abspath(translation_file),
+                        'crop_rect_file': os.path.abspath(crop_rect_file), 'max_translation': 20}
+
+            completed_pairs = self._process_input_output_pairs(name, input_output_pairs, 'motion_correct',
+                                                               motion_correction_params, motion_correction_files)
+            mc_files = []
+            translation_files = []
+            crop_rect_files = []
+            mean_proj_files = []
+            for in_file, out_file in completed_pairs:
+                mc_file, translation_file, crop_rect_file, mean_proj_file = motion_correction_files(in_file, out_file)
+                mc_files.append(mc_file)
                 translation_files.append(translation_file)
-                mean_proj_files.append(mean_proj_file)
                 crop_rect_files.append(crop_rect_file)
+                mean_proj_files.append(mean_proj_file)
             return {'videos': mc_files, 'translations': translation_files, 'crop_rect': crop_rect_files,
                     'mean_projection': mean_proj_files}
 
@@ -96,55 +243,76 @@ class ISXPipeline(CIPipe):
 
     def normalize_dff_videos(self, name="Normalize dF/F Videos"):
         def wrapped_step(input):
-            input_output_pairs = self._input_and_output_files(input, 'videos', name, 'DFF')
-            self._process_input_output_pairs(input_output_pairs, lambda i, o: self._isx.dff(i, o, f0_type='mean'))
-            return {'videos': [out_file for _, out_file in input_output_pairs]}
+            input_output_pairs = self._input_and_output_files(input, 'videos', name, self.STEP_SUFFIXES['normalize_dff_videos'])
+            completed_pairs = self._process_input_output_pairs(name, input_output_pairs, 'dff', lambda i, o: {'f0_type': 'mean'})
+            return {'videos': [out_file for _, out_file in completed_pairs]}
 
         return self.step(name, lambda input: wrapped_step(input))
 
     def extract_neurons_pca_ica(self, name="Extract Neurons PCA-ICA"):
         def wrapped_step(input):
-            input_output_pairs = self._input_and_output_files(input, 'videos', name, 'PCA-ICA')
-            cellsets = []
-            def pca_ica_fn(i, o):
-                self._isx.pca_ica(i, o, 180, int(1.15 * 180), block_size=1000)
-                cellsets.append(o[0])
-            self._process_input_output_pairs(input_output_pairs, pca_ica_fn)
-            return {'cellsets': cellsets}
+            input_output_pairs = self._input_and_output_files(input, 'videos', name, self.STEP_SUFFIXES['extract_neurons_pca_ica'])
+            completed_pairs = self._process_input_output_pairs(name, input_output_pairs, 'pca_ica', lambda i, o: {'num_cells': 180, 'num_ics': int(1.15 * 180), 'block_size': 1000})
+            return {'cellsets': [out_file for _, out_file in completed_pairs]}
 
         return self.step(name, lambda input: wrapped_step(input))
 
     def detect_events_in_cells(self, name="Detect Events in Cells"):
         def wrapped_step(input):
-            input_output_pairs = self._input_and_output_files(input, 'cellsets', name, 'ED')
-            events = []
-            def event_fn(i, o):
-                self._isx.event_detection(i, o, threshold=5)
-                events.append(o[0])
-            self._process_input_output_pairs(input_output_pairs, event_fn)
-            return {'events': events}
+            input_output_pairs = self._input_and_output_files(input, 'cellsets', name, self.STEP_SUFFIXES['detect_events_in_cells'])
+            completed_pairs = self._process_input_output_pairs(name, input_output_pairs, 'event_detection', lambda i, o: {'threshold': 5})
+            return {'events': [out_file for _, out_file in completed_pairs]}
 
         return self.step(name, lambda input: wrapped_step(input))
 
     def auto_accept_reject_cells(self, name="Auto Accept-Reject Cells"):
         def wrapped_step(input):
             input_cellsets = input('cellsets')
-            copied_cellsets = self._copy_files_to_step_folder(input_cellsets, name)
+            input_output_pairs = self._step_folder_copies_of(input_cellsets, name)
             input_events = input('events')
             filters = [('SNR', '>', 3), ('Event Rate', '>', 0), ('# Comps', '=', 1)]
-            matches = self._match_events_to_cellsets(copied_cellsets, input_events)
+            matches = self._match_events_to_cellsets(input_cellsets, input_events, name)
+
             for cellset, event_file in matches.items():
-                print(f"[auto_accept_reject] MATCH: {os.path.basename(cellset)} -> {os.path.basename(event_file)}")
-                self._isx.auto_accept_reject([cellset], [event_file], filters)
-            return {'cellsets': copied_cellsets}
+                self._events.emit(EventBus.INFO, step=name, message="matched events to cellset",
+                                  cellset=os.path.basename(cellset), events=os.path.basename(event_file))
+
+            completed_pairs = self._process_input_output_pairs(name, input_output_pairs, 'auto_accept_reject', lambda i, o: {'event_file': os.path.abspath(matches[i]) if i in matches else None, 'filters': filters})
+            self._step_lineage.update({o: [i, matches[i]] for i, o in completed_pairs if i in matches})
+            return {'cellsets': [out_file for _, out_file in completed_pairs]}
 
         return self.step(name, lambda input: wrapped_step(input))
 
+    @classmethod
+    def planned_output_file(cls, method, input_file, output_folder, step_index, step_name):
+        # Same names as a run gives the files a step writes, following isx.make_output_file_paths without loading isx
+        step_folder = cls._step_folder_path_in(output_folder, step_index, step_name)
+        suffix = cls.STEP_SUFFIXES[method]
+        if suffix is None:
+            return build_filesystem_path_from(step_folder, last_part_of_path(input_file))
+        video_name = os.path.splitext(last_part_of_path(input_file))[0]
+        return build_filesystem_path_from(step_folder, f"{video_name}-{suffix}.isxd")
+
+    @classmethod
+    def _step_folder_path_in(cls, output_folder, step_index, step_name):
+        return build_filesystem_path_from(output_folder, f"step {step_index} - {step_name}")
+
     def _step_folder_path(self, step_name):
         steps = list(self._logger.read_json_from_file().keys())
         last_step_index_from_trace = int(steps[-1]) if steps else 0
-        step_folder_name = f"step {last_step_index_from_trace + 1} - {step_name}"
-        return build_filesystem_path_from(self._output_folder, step_folder_name)
+        return self._step_folder_path_in(self._output_folder, last_step_index_from_trace + 1, step_name)
+
+    def _steps_before_released_files(self, steps):
+        # A file released from quarantine rewinds the trace to its step, so that step and the ones after it run
+        # again; files they already completed are skipped through the checkpoint
+        released_step_names = self._checkpoint.released_step_names()
+        for index, step in enumerate(steps):
+            if step.info()["name"] in released_step_names:
+                self._events.emit(EventBus.INFO, step=step.info()["name"],
+                                  message="released files rewind the trace to this step")
+                self._logger.write_json_to_file(TraceBuilder.build_dictionary_trace_from(steps[:index]))
+                return steps[:index]
+        return steps
 
     def _update_trace(self):
         trace = TraceBuilder.build_dictionary_trace_from(self._steps)
@@ -159,44 +327,119 @@ class ISXPipeline(CIPipe):
             input_output_pairs.append((in_file, out_file))
         return input_output_pairs
 
-    def _process_input_output_pairs(self, input_output_pairs, fn):
+    def _process_input_output_pairs(self, step_name, input_output_pairs, operation, params_for=None,
+                                    output_files_for=None):
+        params_for = params_for or (lambda in_file, out_file: {})
+        output_files_for = output_files_for or (lambda in_file, out_file: [out_file])
+        pending_pairs = []
         for in_file, out_file in input_output_pairs:
-            fn([in_file], [out_file])
+            if self._checkpoint.is_completed(step_name, in_file):
+                self._events.emit(EventBus.FILE_SKIPPED, step=step_name, file=in_file)
+            elif not self._checkpoint.is_quarantined(step_name, in_file):
+                pending_pairs.append((in_file, out_file))
+        # Workers may run from another directory or host, so tasks only carry absolute paths
+        tasks = [{"operation": operation, "input_files": [os.path.abspath(in_file)],
+                  "output_files": [os.path.abspath(out_file)], "params": params_for(in_file, out_file)}
+                 for in_file, out_file in pending_pairs]
+        sizes, frames = self._progress_estimator.measure([in_file for in_file, _ in pending_pairs])
+        self._progress = StepProgress(step_name, self._task_executor.BACKEND, sizes, frames,
+                                      self._progress_estimator.rate(step_name))
+        failed_files = []
+
+        def on_task_finished(index, error):
+            in_file, out_file = pending_pairs[index]
+            if error is None:
+                output_bytes, _ = self._progress_estimator.volume_of(output_files_for(in_file, out_file))
+                _, output_frames = self._progress_estimator.volume_of([out_file])
+                self._progress.file_finished(in_file, True, output_bytes, output_frames)
+                self._checkpoint.mark_completed(step_name, in_file, output_files_for(in_file, out_file))
+                self._events.emit(EventBus.FILE_COMPLETED, step=step_name, file=in_file, output=out_file,
+                                  **self._progress.snapshot())
+                return
+            self._progress.file_finished(in_file, False)
+            failed_runs = self._checkpoint.mark_failed(step_name, in_file, error)
+            self._events.emit(EventBus.FILE_FAILED, step=step_name, file=in_file, error=repr(error),
+                              failed_runs=failed_runs, **self._progress.snapshot())
+            if self._retry_policy.should_quarantine(failed_runs):
+                self._checkpoint.quarantine(step_name, in_file)
+                self._events.emit(EventBus.FILE_QUARANTINED, step=step_name, file=in_file)
+            else:
+                failed_files.append(in_file)
+
+        self._task_executor.run(tasks, self._retry_policy, lambda: self._wait_for_disk_space(step_name),
+                                on_task_finished)
+        self._record_throughput(step_name)
+        if failed_files:
+            raise RuntimeError(f"{self.FAILED_FILES_ERROR}: {', '.join(failed_files)}")
+        completed_pairs = [(in_file, out_file) for in_file, out_file in input_output_pairs
+                           if self._checkpoint.is_completed(step_name, in_file)]
+        for in_file, out_file in completed_pairs:
+            for output_file in output_files_for(in_file, out_file):
+                self._step_lineage.setdefault(output_file, [in_file] + self._duplicate_inputs.get(in_file, []))
+        return completed_pairs
+
+    def _record_throughput(self, step_name):
+        if self._throughput_history is None or not self._progress.processed_bytes():
+            return
+        self._throughput_history.record(step_name, self._task_executor.BACKEND, self._progress.processed_bytes(),
+                                        self._progress.processed_frames(), self._progress.elapsed_seconds(),
+                                        self._progress.output_bytes(), self._progress.output_frames())
+
+    def _wait_for_disk_space(self, step_name):
+        if self._disk_space_governor is None:
+            return
+        self._disk_space_governor.wait_for_space(
+            self._output_folder,
+            lambda free_bytes: self._events.emit(EventBus.WARNING, step=step_name, free_bytes=free_bytes,
+                                                 message="paused until disk space is available"))
 
-    def _basename_no_ext(self, path):
-        return os.path.splitext(os.path.basename(path))[0]
+    def _release_intermediate_files(self, step_name):
+        # A step output is an intermediate once a later step produced the same key: look ups only see the
+        # latest producer, so every consumer of the older files has already finished.
+        if not self._retention_policy.releases_files():
+            return
+        live_files = {file for files in self._pipeline_inputs.values() for file in files}
+        live_files.update(self._checkpoint.files_kept_for_quarantine())
+        seen_keys = set()
+        dead_files_by_step = []
+        for step in reversed(self._steps):
+            for key, files in step.step_output().items():
+                if key in seen_keys:
+                    dead_files_by_step.extend((step, file) for file in files)
+                else:
+                    live_files.update(files)
+                seen_keys.add(key)
+        released_files = [f for _, f in dead_files_by_step if f not in live_files and f not in self._released_files]
+        reclaimed_bytes, locations = self._retention_policy.release(released_files)
+        for step, file in dead_files_by_step:
+            if file in locations:
+                step.record_released({file: locations[file]})
+        self._released_files.update(released_files)
+        self._reclaimed_bytes += reclaimed_bytes
+        if locations:
+            self._update_trace()
+        if released_files:
+            self._events.emit(EventBus.DISK_RECLAIMED, step=step_name, files=len(released_files),
+                              bytes=reclaimed_bytes, total_bytes=self._reclaimed_bytes)
 
-    def _match_events_to_cellsets(self, cellsets, events):
-        # This is temporary, we will persist the correspondent inputs so we don't have to match them manually
-        # Exact prefix match: event basename must be f"{cellset_basename}-ED"
-        event_by_base = { self._basename_no_ext(ev): ev for ev in events }
+    def _match_events_to_cellsets(self, cellsets, events, step_name):
+        lineage = self.lineage()
+        event_files = set(events)
         matches = {}
-        unmatched_cellsets = []
         for cs in cellsets:
-            cs_base = self._basename_no_ext(cs)
-            expected_event_base = f"{cs_base}-ED"
-            ev = event_by_base.get(expected_event_base)
-            if ev:
-                matches[cs] = ev
+            cellset_events = sorted(lineage.children_of(cs) & event_files)
+            if cellset_events:
+                matches[cs] = cellset_events[0]
             else:
-                unmatched_cellsets.append(cs)
+                self._events.emit(EventBus.WARNING, step=step_name, message="unmatched cellset",
+                                  file=os.path.basename(cs))
         used_events = set(matches.values())
-        unmatched_events = [ev for ev in events if ev not in used_events]
-        if unmatched_cellsets:
-            print("[auto_accept_reject] UNMATCHED CELLSETS:")
-            for cs in unmatched_cellsets:
-                print(f"  - {os.path.basename(cs)}")
-        if unmatched_events:
-            print("[auto_accept_reject] UNMATCHED EVENTS:")
-            for ev in unmatched_events:
-                print(f"  - {os.path.basename(ev)}")
+        for ev in events:
+            if ev not in used_events:
+                self._events.emit(EventBus.WARNING, step=step_name, message="unmatched events",
+                                  file=os.path.basename(ev))
         return matches
 
-    def _copy_files_to_step_folder(self, files, step_name):
+    def _step_folder_copies_of(self, files, step_name):
         step_folder = self._step_folder_path(step_name)
-        copied_files = []
-        for file in files:
-            dest = build_filesystem_path_from(step_folder, last_part_of_path(file))
-            shutil.copy2(file, dest)
-            copied_files.append(dest)
-        return copied_files
+        return [(file, build_filesystem_path_from(step_folder, last_part_of_path(file))) for file in files]
@@ -0,0 +1,53 @@
+import shutil
+
+TASK_NOT_FOUND_ERROR = "Unknown isx task"
+
+
+def preprocess(isx, input_files, output_files):
+    isx.preprocess(input_files, output_files)
+
+
+def spatial_filter(isx, input_files, output_files, low_cutoff, high_cutoff):
+    isx.spatial_filter(input_files, output_files, low_cutoff=low_cutoff, high_cutoff=high_cutoff)
+
+
+def motion_correct(isx, input_files, output_files, mean_proj_file, translation_file, crop_rect_file,
+                   max_translation):
+    isx.project_movie(input_files, mean_proj_file, stat_type='mean')
+    isx.motion_correct(input_files, output_files, max_translation=max_translation, reference_file_name=mean_proj_file,
+                       output_translation_files=[translation_file], output_crop_rect_file=crop_rect_file)
+
+
+def dff(isx, input_files, output_files, f0_type):
+    isx.dff(input_files, output_files, f0_type=f0_type)
+
+
+def pca_ica(isx, input_files, output_files, num_cells, num_ics, block_size):
+    isx.pca_ica(input_files, output_files, num_cells, num_ics, block_size=block_size)
+
+
+def event_detection(isx, input_files, output_files, threshold):
+    isx.event_detection(input_files, output_files, threshold=threshold)
+
+
+def auto_accept_reject(isx, input_files, output_files, event_file, filters):
+    shutil.copy2(input_files[0], output_files[0])
+    if event_file:
+        isx.auto_accept_reject(output_files, [event_file], [tuple(f) for f in filters])
+
+
+TASKS = {
+    "preprocess": preprocess,
+    "spatial_filter": spatial_filter,
+    "motion_correct": motion_correct,
+    "dff": dff,
+    "pca_ica": pca_ica,
+    "event_detection": event_detection,
+    "auto_accept_reject": auto_accept_reject,
+}
+
+
+def run_task(isx, operation, input_files, output_files, params):
+    if operation not in TASKS:
+        raise KeyError(f"{TASK_NOT_FOUND_ERROR}: '{operation}'")
+    TASKS[operation](isx, input_files, output_files, **params)
@@ -0,0 +1,31 @@
+import json
+import os
+import struct
+
+# .isxd files end with a JSON header followed by its size as a little-endian uint64, so metadata can be read
+# without touching the frame data
+FOOTER_SIZE_BYTES = 8
+
+
+def read_isxd_header(path):
+    try:
+        with open(path, "rb") as file:
+            file.seek(-FOOTER_SIZE_BYTES, os.SEEK_END)
+            header_size = struct.unpack("<Q", file.read(FOOTER_SIZE_BYTES))[0]
+            if header_size + FOOTER_SIZE_BYTES > os.fstat(file.fileno()).st_size:
+                return None
+            file.seek(-FOOTER_SIZE_BYTES - header_size, os.SEEK_END)
+            header = file.read(header_size)
+    except (OSError, struct.error):
+        return None
+    try:
+        return json.loads(header.rstrip(b"\x00").decode("utf-8"))
+    except (UnicodeDecodeError, ValueError):
+        return None
+
+
+def isxd_frame_count(path):
+    header = read_isxd_header(path)
+    if not isinstance(header, dict):
+        return None
+    return header.get("timingInfo", {}).get("numTimes")
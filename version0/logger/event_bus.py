@@ -0,0 +1,134 @@
+import atexit
+import queue
+import sys
+import threading
+import time
+
+from logger.event_sinks import FileEventSink, StdoutEventSink
+
+
+class _FlushRequest:
+    def __init__(self):
+        self.done = threading.Event()
+
+
+class _StopRequest(_FlushRequest):
+    pass
+
+
+class EventBus:
+    STEP_STARTED = "step_started"
+    STEP_FINISHED = "step_finished"
+    STEP_FAILED = "step_failed"
+    STEP_SKIPPED = "step_skipped"
+    FILE_COMPLETED = "file_completed"
+    FILE_SKIPPED = "file_skipped"
+    FILE_FAILED = "file_failed"
+    FILE_QUARANTINED = "file_quarantined"
+    DISK_RECLAIMED = "disk_reclaimed"
+    DUPLICATE_INPUT = "duplicate_input"
+    WARNING = "warning"
+    INFO = "info"
+
+    _default = None
+
+    def __init__(self, sinks, batch_size=256, wait_timeout_seconds=30.0):
+        self._sinks = list(sinks)
+        self._batch_size = batch_size
+        self._wait_timeout_seconds = wait_timeout_seconds
+        self._queue = queue.SimpleQueue()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        self._dropped_events = 0
+        atexit.register(self.close)
+
+    @classmethod
+    def default(cls):
+        if cls._default is None:
+            cls._default = cls([StdoutEventSink()])
+        return cls._default
+
+    @classmethod
+    def from_settings(cls, directory, file=None, stdout=True):
+        sinks = []
+        if file is not None:
+            sinks.append(FileEventSink.in_directory(directory, file))
+        if stdout:
+            sinks.append(StdoutEventSink())
+        return cls(sinks)
+
+    def emit(self, event_type, **fields):
+        # Hot path: callers only pay for building the dict and a queue put, the writer thread does the I/O
+        self._start_writer_if_needed()
+        self._queue.put({"time": time.time(), "event": event_type, **fields})
+
+    def flush(self):
+        if self._writer is None:
+            return
+        request = _FlushRequest()
+        self._queue.put(request)
+        self._wait_for(request)
+
+    def close(self):
+        if self._writer is None:
+            return
+        request = _StopRequest()
+        self._queue.put(request)
+        if self._wait_for(request):
+            self._writer.join()
+        self._writer = None
+        for sink in self._sinks:
+            sink.close()
+
+    def dropped_events(self):
+        return self._dropped_events
+
+    def _wait_for(self, request):
+        # Never block the pipeline or interpreter exit on a writer that died or a sink that hangs
+        deadline = time.monotonic() + self._wait_timeout_seconds
+        while not request.done.wait(0.05):
+            if not self._writer.is_alive() or time.monotonic() >= deadline:
+                return False
+        return True
+
+    def _start_writer_if_needed(self):
+        if self._writer is not None:
+            return
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_forever, name="event-bus-writer", daemon=True)
+                self._writer.start()
+
+    def _write_forever(self):
+        while True:
+            batch = []
+            request = None
+            item = self._queue.get()
+            while True:
+                if isinstance(item, _FlushRequest):
+                    request = item
+                    break
+                batch.append(item)
+                if len(batch) >= self._batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            try:
+                if batch:
+                    self._write_batch(batch)
+            finally:
+                if request is not None:
+                    request.done.set()
+            if isinstance(request, _StopRequest):
+                return
+
+    def _write_batch(self, batch):
+        for sink in self._sinks:
+            try:
+                sink.write_batch(batch)
+            except Exception as error:
+                # A failing sink (e.g. a full volume) drops its batch instead of killing the writer
+                self._dropped_events += len(batch)
+                print(f"Dropped {len(batch)} events: {type(sink).__name__} failed with {error!r}", file=sys.stderr)
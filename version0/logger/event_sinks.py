@@ -0,0 +1,58 @@
+import json
+import sys
+
+from utils import create_directory_from, build_filesystem_path_from
+
+
+class FileEventSink:
+    def __init__(self, filepath):
+        self._filepath = filepath
+        self._file = None
+
+    def write_batch(self, events):
+        if self._file is None:
+            self._file = open(self._filepath, "a", encoding="utf-8")
+        self._file.write("".join(json.dumps(event) + "\n" for event in events))
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    @classmethod
+    def in_directory(cls, directory, filename):
+        create_directory_from(directory)
+        return cls(build_filesystem_path_from(directory, filename))
+
+
+class StdoutEventSink:
+    def __init__(self, stream=None):
+        self._stream = stream
+
+    def write_batch(self, events):
+        stream = self._stream or sys.stdout
+        stream.write("".join(self._format(event) + "\n" for event in events))
+        stream.flush()
+
+    def close(self):
+        pass
+
+    def _format(self, event):
+        fields = " ".join(f"{key}={value}" for key, value in event.items() if key not in ("time", "event", "step"))
+        step = f"[{event['step']}] " if "step" in event else ""
+        return f"{step}{event['event']} {fields}".rstrip()
+
+
+class InMemoryEventSink:
+    def __init__(self):
+        self._events = []
+
+    def write_batch(self, events):
+        self._events.extend(events)
+
+    def close(self):
+        pass
+
+    def events(self, event_type=None):
+        return [event for event in self._events if event_type is None or event["event"] == event_type]
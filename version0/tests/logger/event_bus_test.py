@@ -0,0 +1,93 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from logger.event_bus import EventBus
+from logger.event_sinks import FileEventSink, InMemoryEventSink, StdoutEventSink
+
+
+class EventBusTestCase(unittest.TestCase):
+    def test_01_emitted_events_reach_every_sink_in_order(self):
+        # Given
+        first_sink = InMemoryEventSink()
+        second_sink = InMemoryEventSink()
+        event_bus = EventBus([first_sink, second_sink])
+
+        # When
+        for index in range(1000):
+            event_bus.emit(EventBus.FILE_COMPLETED, step="Preprocess Videos", index=index)
+        event_bus.flush()
+
+        # Then
+        self.assertEqual([event["index"] for event in first_sink.events()], list(range(1000)))
+        self.assertEqual(first_sink.events(), second_sink.events())
+        event_bus.close()
+
+    def test_02_file_sink_writes_json_lines(self):
+        # Given
+        with tempfile.TemporaryDirectory() as directory:
+            event_bus = EventBus([FileEventSink.in_directory(directory, "events.jsonl")])
+
+            # When
+            event_bus.emit(EventBus.STEP_STARTED, step="Preprocess Videos")
+            event_bus.emit(EventBus.STEP_FINISHED, step="Preprocess Videos", seconds=1.5)
+            event_bus.close()
+
+            # Then
+            with open(os.path.join(directory, "events.jsonl")) as file:
+                events = [json.loads(line) for line in file]
+        self.assertEqual([event["event"] for event in events], [EventBus.STEP_STARTED, EventBus.STEP_FINISHED])
+        self.assertEqual(events[1]["seconds"], 1.5)
+
+    def test_03_stdout_sink_formats_one_line_per_event(self):
+        # Given
+        stream = io.StringIO()
+        event_bus = EventBus([StdoutEventSink(stream)])
+
+        # When
+        event_bus.emit(EventBus.WARNING, step="Auto Accept-Reject Cells", message="unmatched", file="a.isxd")
+        event_bus.close()
+
+        # Then
+        self.assertEqual(stream.getvalue(), "[Auto Accept-Reject Cells] warning message=unmatched file=a.isxd\n")
+
+    def test_04_flush_without_events_does_not_block(self):
+        # Given
+        sink = InMemoryEventSink()
+        event_bus = EventBus([sink])
+
+        # When
+        event_bus.flush()
+        event_bus.close()
+
+        # Then
+        self.assertEqual(sink.events(), [])
+
+    def test_05_a_failing_sink_drops_its_batch_without_blocking_flush_or_other_sinks(self):
+        # Given
+        class FullDiskSink(InMemoryEventSink):
+            def write_batch(self, events):
+                raise OSError("disk full")
+
+        healthy_sink = InMemoryEventSink()
+        event_bus = EventBus([FullDiskSink(), healthy_sink], wait_timeout_seconds=5.0)
+        errors = io.StringIO()
+
+        # When
+        with contextlib.redirect_stderr(errors):
+            event_bus.emit(EventBus.INFO, message="first")
+            event_bus.flush()
+            event_bus.emit(EventBus.INFO, message="second")
+            event_bus.close()
+
+        # Then
+        self.assertEqual([event["message"] for event in healthy_sink.events()], ["first", "second"])
+        self.assertEqual(event_bus.dropped_events(), 2)
+        self.assertIn("disk full", errors.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
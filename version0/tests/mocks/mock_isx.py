@@ -0,0 +1,54 @@
+import os
+
+
+class MockIsx:
+    def __init__(self, failures=None):
+        self.calls = []
+        self.failures = dict(failures or {})
+
+    def make_output_file_paths(self, input_files, output_dir, suffix, ext="isxd"):
+        return [os.path.join(output_dir, f"{os.path.splitext(os.path.basename(f))[0]}-{suffix}.{ext}")
+                for f in input_files]
+
+    def preprocess(self, input_files, output_files, **kwargs):
+        self._write("preprocess", input_files, output_files)
+
+    def spatial_filter(self, input_files, output_files, **kwargs):
+        self._write("spatial_filter", input_files, output_files)
+
+    def project_movie(self, input_files, output_file, **kwargs):
+        self._write("project_movie", input_files, [output_file])
+
+    def motion_correct(self, input_files, output_files, output_translation_files=(), output_crop_rect_file=None,
+                       **kwargs):
+        self._write("motion_correct", input_files, list(output_files) + list(output_translation_files) +
+                    ([output_crop_rect_file] if output_crop_rect_file else []))
+
+    def dff(self, input_files, output_files, **kwargs):
+        self._write("dff", input_files, output_files)
+
+    def pca_ica(self, input_files, output_files, *args, **kwargs):
+        self._write("pca_ica", input_files, output_files)
+
+    def event_detection(self, input_files, output_files, **kwargs):
+        self._write("event_detection", input_files, output_files)
+
+    def auto_accept_reject(self, cellset_files, event_files, filters):
+        self.calls.append(("auto_accept_reject", list(cellset_files), list(event_files)))
+
+    def _write(self, name, input_files, output_files):
+        self.calls.append((name, list(input_files), list(output_files)))
+        self._fail_if_requested(input_files)
+        for input_file in input_files:
+            if not os.path.exists(input_file):
+                raise FileNotFoundError(input_file)
+        for output_file in output_files:
+            with open(output_file, "w") as file:
+                file.write(name)
+
+    def _fail_if_requested(self, input_files):
+        for input_file in input_files:
+            basename = os.path.basename(input_file)
+            if self.failures.get(basename, 0) > 0:
+                self.failures[basename] -= 1
+                raise IOError(f"Corrupt recording: {basename}")
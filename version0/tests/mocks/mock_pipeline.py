@@ -0,0 +1,19 @@
+from ci_pipe.pipeline import CIPipe
+
+
+class MockPipeline(CIPipe):
+    STEP_FILES = {"add": ("numbers", "numbers"), "double": ("numbers", "numbers")}
+    STEPS = tuple(STEP_FILES)
+
+    @classmethod
+    def new(cls, input_directory, logger):
+        pipeline = cls({"numbers": [1, 2]})
+        pipeline.input_directory = input_directory
+        pipeline.logger = logger
+        return pipeline
+
+    def add(self, amount=1, name="Add"):
+        return self.step(name, lambda inputs: {"numbers": [n + amount for n in inputs("numbers")]})
+
+    def double(self, name="Double"):
+        return self.step(name, lambda inputs: {"numbers": [n * 2 for n in inputs("numbers")]})
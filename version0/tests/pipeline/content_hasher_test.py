@@ -0,0 +1,75 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from ci_pipe.content_hasher import ContentHasher
+
+
+class ContentHasherTestCase(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def test_01_identical_files_are_reported_as_duplicates_of_the_first_path(self):
+        # Given
+        paths = [self._write("a.isxd", b"frames"), self._write("b.isxd", b"frames"), self._write("c.isxd", b"other!")]
+
+        # When
+        duplicates = ContentHasher(chunk_size=4).duplicates_in(paths)
+
+        # Then
+        self.assertEqual(duplicates, {paths[0]: [paths[1]]})
+
+    def test_02_files_with_unique_sizes_are_never_hashed(self):
+        # Given
+        paths = [self._write("a.isxd", b"short"), self._write("b.isxd", b"much longer")]
+        hasher = ContentHasher()
+
+        # When
+        with mock.patch.object(hasher, "hash_file") as hash_file:
+            duplicates = hasher.duplicates_in(paths)
+
+        # Then
+        hash_file.assert_not_called()
+        self.assertEqual(duplicates, {})
+
+    def test_03_cached_digests_are_reused_while_files_are_unchanged(self):
+        # Given
+        paths = [self._write("a.isxd", b"frames"), self._write("b.isxd", b"frames")]
+        hasher = ContentHasher()
+        cache = {}
+        hasher.duplicates_in(paths, cache)
+
+        # When
+        with mock.patch.object(hasher, "hash_file") as hash_file:
+            duplicates = hasher.duplicates_in(paths, cache)
+
+        # Then
+        hash_file.assert_not_called()
+        self.assertEqual(duplicates, {paths[0]: [paths[1]]})
+
+    def test_04_recordings_registered_by_another_session_are_shared_with_it(self):
+        # Given
+        paths = [self._write("a.isxd", b"frames"), self._write("b.isxd", b"frames")]
+        hasher = ContentHasher(cache=os.path.join(self._directory.name, "digests.sqlite"))
+        hasher.shared_duplicates_in(paths[:1], {}, "first/trace.json")
+
+        # When
+        shared = hasher.shared_duplicates_in(paths[1:], {}, "second/trace.json")
+
+        # Then
+        self.assertEqual([(path, canonical["file"], canonical["trace_path"]) for path, canonical in shared.items()],
+                         [(paths[1], paths[0], "first/trace.json")])
+
+    def _write(self, filename, content):
+        path = os.path.join(self._directory.name, filename)
+        with open(path, "wb") as file:
+            file.write(content)
+        return path
+
+
+if __name__ == '__main__':
+    unittest.main()
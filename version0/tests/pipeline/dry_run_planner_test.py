@@ -0,0 +1,171 @@
+import json
+import os
+import tempfile
+import unittest
+
+from ci_pipe.dry_run_planner import DryRunPlanner
+from ci_pipe.file_checkpoint import FileCheckpoint
+from ci_pipe.retention_policy import RetentionPolicy
+from ci_pipe.retry_policy import RetryPolicy
+from ci_pipe.step_plan import StepPlan
+from ci_pipe.throughput_history import ThroughputHistory
+from isx_pipeline.isx_pipeline import ISXPipeline
+from logger.event_bus import EventBus
+from logger.event_sinks import InMemoryEventSink
+from logger.file_logger import FileLogger
+from tests.mocks.mock_isx import MockIsx
+
+
+class DryRunPlannerTestCase(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self._input_directory = os.path.join(self._directory.name, "videos")
+        self._output_directory = os.path.join(self._directory.name, "output")
+        os.makedirs(self._input_directory)
+        for video_name, size in (("a.isxd", 10), ("b.isxd", 20)):
+            with open(os.path.join(self._input_directory, video_name), "w") as file:
+                file.write("x" * size)
+        self._event_bus = EventBus([InMemoryEventSink()])
+
+    def tearDown(self):
+        self._event_bus.close()
+        self._directory.cleanup()
+
+    def test_01_fresh_run_plans_every_step_without_touching_the_output_folder(self):
+        # Given
+        plan = self._plan_of("preprocess_videos", "extract_neurons_pca_ica")
+
+        # When
+        dry_run = DryRunPlanner(plan).plan()
+
+        # Then
+        self.assertEqual([step["status"] for step in dry_run["steps"]], [DryRunPlanner.RUN, DryRunPlanner.RUN])
+        self.assertEqual([file["status"] for file in dry_run["steps"][1]["files"]], [DryRunPlanner.NEW] * 2)
+        self.assertTrue(all(file["planned"] for file in dry_run["steps"][1]["files"]))
+        self.assertEqual([step["read_bytes"] for step in dry_run["steps"]], [30, None])
+        self.assertIsNone(dry_run["read_bytes"])
+        self.assertFalse(os.path.exists(self._output_directory))
+        self.assertFalse(ISXPipeline.isx_package.is_loaded())
+
+    def test_02_traced_steps_are_skipped_and_their_outputs_feed_the_next_step(self):
+        # Given
+        self._new_pipeline(MockIsx()).preprocess_videos()
+        plan = self._plan_of("preprocess_videos", "bandpass_filter_videos")
+
+        # When
+        dry_run = DryRunPlanner(plan).plan()
+
+        # Then
+        skipped, bandpass = dry_run["steps"]
+        self.assertEqual((skipped["status"], skipped["read_bytes"]), (DryRunPlanner.SKIPPED, 0))
+        self.assertEqual(sorted(os.path.basename(file["file"]) for file in bandpass["files"]),
+                         ["a-PP.isxd", "b-PP.isxd"])
+        self.assertEqual({file["status"] for file in bandpass["files"]}, {DryRunPlanner.NEW})
+
+    def test_03_files_are_classified_from_the_checkpoint_of_an_interrupted_step(self):
+        # Given
+        pipeline = self._new_pipeline(MockIsx({"a-PP.isxd": 1}), RetryPolicy(max_attempts=1, quarantine_after=2))
+        pipeline.preprocess_videos()
+        with self.assertRaises(RuntimeError):
+            pipeline.bandpass_filter_videos()
+        plan = self._plan_of("preprocess_videos", "bandpass_filter_videos")
+
+        # When
+        dry_run = DryRunPlanner(plan).plan()
+
+        # Then
+        statuses = {os.path.basename(file["file"]): file["status"] for file in dry_run["steps"][1]["files"]}
+        self.assertEqual(statuses, {"a-PP.isxd": DryRunPlanner.RECOMPUTED, "b-PP.isxd": DryRunPlanner.SKIPPED})
+        self.assertEqual(dry_run["read_bytes"], os.path.getsize(
+            os.path.join(self._output_directory, "step 1 - Preprocess Videos", "a-PP.isxd")))
+
+    def test_04_steps_without_declared_files_cannot_be_planned(self):
+        # Given
+        plan = StepPlan(self._input_directory, self._output_directory, [("set_defaults", {})],
+                        {"pipeline": "tests.mocks.mock_pipeline:MockPipeline"})
+
+        # When
+        with self.assertRaises(ValueError) as result:
+            DryRunPlanner(plan).plan()
+
+        # Then
+        self.assertTrue(result.exception.args[0].startswith(DryRunPlanner.UNPLANNABLE_STEP_ERROR))
+
+    def test_05_compressed_inputs_are_reported_at_their_archive(self):
+        # Given
+        (self._new_pipeline(MockIsx(), retention_policy=RetentionPolicy(RetentionPolicy.COMPRESS))
+         .preprocess_videos()
+         .bandpass_filter_videos())
+        trace_path = os.path.join(self._output_directory, "trace.json")
+        with open(trace_path) as file:
+            trace = json.load(file)
+        with open(trace_path, "w") as file:
+            # As if the bandpass step had to run again
+            json.dump({"1": trace["1"]}, file)
+
+        # When
+        dry_run = DryRunPlanner(self._plan_of("preprocess_videos", "bandpass_filter_videos")).plan()
+
+        # Then
+        files = dry_run["steps"][1]["files"]
+        self.assertEqual({file["status"] for file in files}, {DryRunPlanner.ARCHIVED})
+        self.assertEqual(sorted(os.path.basename(file["file"]) for file in files), ["a-PP.isxd.gz", "b-PP.isxd.gz"])
+
+    def test_06_files_released_from_quarantine_send_their_step_back_to_the_plan(self):
+        # Given
+        pipeline = self._new_pipeline(MockIsx({"a.isxd": 1}), RetryPolicy(max_attempts=1, quarantine_after=1))
+        pipeline.preprocess_videos().bandpass_filter_videos()
+        quarantined_file = pipeline.quarantined_files()["Preprocess Videos"][0]
+        FileCheckpoint.new_for(self._output_directory).release_quarantine("Preprocess Videos", quarantined_file)
+
+        # When
+        dry_run = DryRunPlanner(self._plan_of("preprocess_videos", "bandpass_filter_videos")).plan()
+
+        # Then
+        statuses = {os.path.basename(file["file"]): file["status"] for file in dry_run["steps"][0]["files"]}
+        self.assertEqual(statuses, {"a.isxd": DryRunPlanner.RECOMPUTED, "b.isxd": DryRunPlanner.SKIPPED})
+        self.assertEqual(dry_run["steps"][1]["status"], DryRunPlanner.RUN)
+
+    def test_07_planned_files_are_named_after_their_step_folder_and_sized_through_the_history(self):
+        # Given
+        history = ThroughputHistory.new_for(os.path.join(self._directory.name, "history.sqlite"))
+        history.record("Preprocess Videos", "local", 100, None, 1.0, output_bytes=50)
+        plan = self._plan_of("preprocess_videos", "extract_neurons_pca_ica")
+
+        # When
+        dry_run = DryRunPlanner(plan, history).plan()
+        history.close()
+
+        # Then
+        files = dry_run["steps"][1]["files"]
+        self.assertEqual([file["file"] for file in files],
+                         [os.path.join(self._output_directory, "step 1 - Preprocess Videos", name)
+                          for name in ("a-PP.isxd", "b-PP.isxd")])
+        self.assertEqual([file["bytes"] for file in files], [5, 10])
+        self.assertEqual(dry_run["read_bytes"], 45)
+
+    def test_08_files_completed_after_a_rewound_step_are_skipped_downstream(self):
+        # Given
+        pipeline = self._new_pipeline(MockIsx({"a.isxd": 1}), RetryPolicy(max_attempts=1, quarantine_after=1))
+        pipeline.preprocess_videos().bandpass_filter_videos()
+        quarantined_file = pipeline.quarantined_files()["Preprocess Videos"][0]
+        FileCheckpoint.new_for(self._output_directory).release_quarantine("Preprocess Videos", quarantined_file)
+
+        # When
+        dry_run = DryRunPlanner(self._plan_of("preprocess_videos", "bandpass_filter_videos")).plan()
+
+        # Then
+        statuses = {os.path.basename(file["file"]): file["status"] for file in dry_run["steps"][1]["files"]}
+        self.assertEqual(statuses, {"a-PP.isxd": DryRunPlanner.NEW, "b-PP.isxd": DryRunPlanner.SKIPPED})
+        self.assertIsNone(dry_run["steps"][1]["read_bytes"])
+
+    def _plan_of(self, *methods):
+        return StepPlan(self._input_directory, self._output_directory, [(method, {}) for method in methods])
+
+    def _new_pipeline(self, isx, retry_policy=None, retention_policy=None):
+        logger = FileLogger.new_for("trace.json", self._output_directory)
+        return ISXPipeline.new(self._input_directory, logger, isx, retry_policy, self._event_bus, retention_policy)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+import unittest
+
+from benchmarks.import_time import ImportTimeReport, HEAVY_MODULES
+from lazy_module import LazyModule
+
+
+class ImportTimeTestCase(unittest.TestCase):
+    def test_01_importing_isx_pipeline_does_not_import_heavy_modules(self):
+        # When
+        report = ImportTimeReport.measure("isx_pipeline.isx_pipeline")
+
+        # Then
+        self.assertIn("isx_pipeline.isx_pipeline", report.imported_modules())
+        self.assertEqual(report.imports_any_of(HEAVY_MODULES), [])
+
+    def test_02_importing_cli_does_not_import_heavy_modules(self):
+        # When
+        report = ImportTimeReport.measure("cli")
+
+        # Then
+        self.assertEqual(report.imports_any_of(HEAVY_MODULES), [])
+
+    def test_03_lazy_module_is_imported_on_first_attribute_access(self):
+        # Given
+        lazy_json = LazyModule("json")
+
+        # When
+        loaded_before_access = lazy_json.is_loaded()
+        dumped = lazy_json.dumps([1])
+
+        # Then
+        self.assertFalse(loaded_before_access)
+        self.assertTrue(lazy_json.is_loaded())
+        self.assertEqual(dumped, "[1]")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,395 @@
+import os
+import tempfile
+import unittest
+from collections import namedtuple
+
+from ci_pipe.content_hasher import ContentHasher
+from ci_pipe.disk_space_governor import DiskSpaceGovernor
+from ci_pipe.file_checkpoint import FileCheckpoint
+from ci_pipe.retention_policy import RetentionPolicy
+from ci_pipe.retry_policy import RetryPolicy
+from ci_pipe.throughput_history import ThroughputHistory
+from isx_pipeline.isx_pipeline import ISXPipeline
+from logger.event_bus import EventBus
+from logger.event_sinks import InMemoryEventSink
+from logger.file_logger import FileLogger
+from tests.mocks.mock_isx import MockIsx
+
+
+class ISXPipelineTestCase(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self._input_directory = os.path.join(self._directory.name, "videos")
+        self._output_directory = os.path.join(self._directory.name, "output")
+        os.makedirs(self._input_directory)
+        for video_name in ("a.isxd", "b.isxd"):
+            with open(os.path.join(self._input_directory, video_name), "w") as file:
+                file.write(video_name)
+        self._isx = MockIsx()
+        self._events = InMemoryEventSink()
+        self._event_bus = EventBus([self._events])
+
+    def tearDown(self):
+        self._event_bus.close()
+        self._directory.cleanup()
+
+    def test_01_pipeline_uses_injected_isx_package(self):
+        # Given
+        pipeline = self._new_pipeline()
+
+        # When
+        pipeline.preprocess_videos()
+
+        # Then
+        self.assertEqual([call[0] for call in self._isx.calls], ["preprocess", "preprocess"])
+        self.assertFalse(ISXPipeline.isx_package.is_loaded())
+
+    def test_02_a_failing_file_is_retried_with_backoff(self):
+        # Given
+        self._isx.failures = {"a.isxd": 2}
+        delays = []
+        pipeline = self._new_pipeline(RetryPolicy(max_attempts=3, backoff_seconds=0.5, sleep=delays.append))
+
+        # When
+        pipeline.preprocess_videos()
+
+        # Then
+        self.assertEqual(delays, [0.5, 1.0])
+        self.assertEqual(len(pipeline.output()["videos"]), 2)
+
+    def test_03_resuming_a_failed_step_only_retries_failed_files(self):
+        # Given
+        self._isx.failures = {"a.isxd": 1}
+        pipeline = self._new_pipeline(RetryPolicy(max_attempts=1, quarantine_after=2))
+        with self.assertRaises(RuntimeError):
+            pipeline.preprocess_videos()
+        self._isx.calls = []
+
+        # When
+        resumed_pipeline = self._new_pipeline(RetryPolicy(max_attempts=1, quarantine_after=2))
+        resumed_pipeline.preprocess_videos()
+
+        # Then
+        self.assertEqual([os.path.basename(call[1][0]) for call in self._isx.calls], ["a.isxd"])
+        self.assertEqual(len(resumed_pipeline.output()["videos"]), 2)
+
+    def test_04_files_that_keep_failing_are_quarantined_and_skipped(self):
+        # Given
+        self._isx.failures = {"a.isxd": 10}
+        pipeline = self._new_pipeline(RetryPolicy(max_attempts=2, quarantine_after=1, sleep=lambda seconds: None))
+
+        # When
+        pipeline.preprocess_videos().bandpass_filter_videos()
+
+        # Then
+        quarantined = pipeline.quarantined_files()
+        self.assertEqual(list(quarantined), ["Preprocess Videos"])
+        self.assertEqual([os.path.basename(f) for f in quarantined["Preprocess Videos"]], ["a.isxd"])
+        self.assertEqual([os.path.basename(f) for f in pipeline.output()["videos"]], ["b-PP-BP.isxd"])
+
+    def test_05_full_pipeline_runs_every_step_for_every_video(self):
+        # Given
+        pipeline = self._new_pipeline()
+
+        # When
+        (pipeline
+         .preprocess_videos()
+         .bandpass_filter_videos()
+         .motion_correction_videos()
+         .normalize_dff_videos()
+         .extract_neurons_pca_ica()
+         .detect_events_in_cells()
+         .auto_accept_reject_cells())
+
+        # Then
+        accepted = [call for call in self._isx.calls if call[0] == "auto_accept_reject"]
+        self.assertEqual(len(accepted), 2)
+        self.assertEqual(sorted(os.path.basename(f) for f in pipeline.output()["cellsets"]),
+                         ["a-PP-BP-MC-DFF-PCA-ICA.isxd", "b-PP-BP-MC-DFF-PCA-ICA.isxd"])
+
+    def test_06_pipeline_emits_step_and_file_events(self):
+        # Given
+        self._isx.failures = {"a.isxd": 10}
+        pipeline = self._new_pipeline(RetryPolicy(max_attempts=1, quarantine_after=1))
+
+        # When
+        pipeline.preprocess_videos()
+
+        # Then
+        self.assertEqual([event["event"] for event in self._events.events() if event["event"].startswith("step")],
+                         [EventBus.STEP_STARTED, EventBus.STEP_FINISHED])
+        self.assertEqual(len(self._events.events(EventBus.FILE_COMPLETED)), 1)
+        self.assertEqual(len(self._events.events(EventBus.FILE_QUARANTINED)), 1)
+
+    def test_07_intermediate_outputs_are_deleted_once_superseded(self):
+        # Given
+        pipeline = self._new_pipeline(retention_policy=RetentionPolicy(RetentionPolicy.DELETE))
+
+        # When
+        pipeline.preprocess_videos()
+        preprocessed_files = pipeline.output()["videos"]
+        pipeline.bandpass_filter_videos()
+
+        # Then
+        self.assertFalse(any(os.path.exists(f) for f in preprocessed_files))
+        self.assertTrue(all(os.path.exists(f) for f in pipeline.output()["videos"]))
+        self.assertTrue(all(os.path.exists(f) for f in pipeline.info()["inputs"]["videos"]))
+        self.assertEqual(pipeline.reclaimed_bytes(), 2 * len("preprocess"))
+
+    def test_08_intermediate_outputs_can_be_compressed_instead_of_deleted(self):
+        # Given
+        pipeline = self._new_pipeline(retention_policy=RetentionPolicy(RetentionPolicy.COMPRESS))
+
+        # When
+        pipeline.preprocess_videos()
+        preprocessed_files = pipeline.output()["videos"]
+        pipeline.bandpass_filter_videos()
+
+        # Then
+        self.assertTrue(all(os.path.exists(f"{f}.gz") and not os.path.exists(f) for f in preprocessed_files))
+        trace = FileLogger.new_for("trace.json", self._output_directory).read_json_from_file()
+        self.assertEqual(trace["1"]["released"], {f: f"{f}.gz" for f in preprocessed_files})
+        self.assertEqual(self._new_pipeline().released_files(), {f: f"{f}.gz" for f in preprocessed_files})
+
+    def test_09_processing_pauses_while_free_disk_space_is_below_threshold(self):
+        # Given
+        DiskUsage = namedtuple("DiskUsage", "free")
+        free_space = [10, 10, 1000]
+        delays = []
+        governor = DiskSpaceGovernor(100, poll_seconds=5, sleep=delays.append,
+                                     disk_usage=lambda path: DiskUsage(free_space.pop(0) if free_space else 1000))
+        pipeline = self._new_pipeline(disk_space_governor=governor)
+
+        # When
+        pipeline.preprocess_videos()
+
+        # Then
+        self.assertEqual(delays, [5, 5])
+        self.assertEqual(len(self._events.events(EventBus.WARNING)), 2)
+
+    def test_10_disk_space_governor_gives_up_after_max_wait(self):
+        # Given
+        DiskUsage = namedtuple("DiskUsage", "free")
+        governor = DiskSpaceGovernor(100, poll_seconds=5, max_wait_seconds=10, sleep=lambda seconds: None,
+                                     disk_usage=lambda path: DiskUsage(10))
+
+        # When
+        with self.assertRaises(OSError) as result:
+            governor.wait_for_space(self._output_directory)
+
+        # Then
+        self.assertTrue(result.exception.args[0].startswith(DiskSpaceGovernor.NOT_ENOUGH_SPACE_ERROR))
+
+    def test_11_trace_records_keyed_outputs_and_per_file_lineage(self):
+        # Given
+        pipeline = self._new_pipeline()
+
+        # When
+        pipeline.preprocess_videos()
+
+        # Then
+        trace = FileLogger.new_for("trace.json", self._output_directory).read_json_from_file()
+        outputs = trace["1"]["output"]["videos"]
+        self.assertEqual(len(outputs), 2)
+        self.assertEqual({os.path.basename(trace["1"]["lineage"][f][0]) for f in outputs}, {"a.isxd", "b.isxd"})
+
+    def test_12_events_are_paired_with_cellsets_through_lineage_after_resume(self):
+        # Given
+        self._isx.make_output_file_paths = self._numbered_event_paths(self._isx.make_output_file_paths)
+        (self._new_pipeline()
+         .preprocess_videos()
+         .bandpass_filter_videos()
+         .motion_correction_videos()
+         .normalize_dff_videos()
+         .extract_neurons_pca_ica()
+         .detect_events_in_cells())
+
+        # When
+        resumed_pipeline = self._new_pipeline()
+        resumed_pipeline.auto_accept_reject_cells()
+
+        # Then
+        accepted = [call for call in self._isx.calls if call[0] == "auto_accept_reject"]
+        self.assertEqual(len(accepted), 2)
+        lineage = resumed_pipeline.lineage()
+        for _, cellsets, events in accepted:
+            event_cellset = list(lineage.parents_of(events[0]))[0]
+            self.assertEqual(os.path.basename(event_cellset), os.path.basename(cellsets[0]))
+        self.assertEqual(self._events.events(EventBus.WARNING), [])
+
+    def test_13_identical_recordings_are_processed_once_and_linked_to_shared_outputs(self):
+        # Given
+        duplicate = os.path.join(self._input_directory, "a-copy.isxd")
+        with open(duplicate, "w") as file:
+            file.write("a.isxd")
+        pipeline = self._new_pipeline(content_hasher=ContentHasher())
+
+        # When
+        pipeline.preprocess_videos()
+
+        # Then
+        self.assertEqual(len([call for call in self._isx.calls if call[0] == "preprocess"]), 2)
+        canonical, duplicates = list(pipeline.duplicate_inputs().items())[0]
+        self.assertEqual(sorted(os.path.basename(f) for f in [canonical] + duplicates), ["a-copy.isxd", "a.isxd"])
+        shared_outputs = pipeline.lineage().children_of(duplicates[0])
+        self.assertEqual(shared_outputs, pipeline.lineage().children_of(canonical))
+        self.assertEqual(len(self._events.events(EventBus.DUPLICATE_INPUT)), 1)
+
+    def test_14_file_events_report_progress_and_finished_steps_feed_the_throughput_history(self):
+        # Given
+        history = ThroughputHistory.new_for(os.path.join(self._directory.name, "history.sqlite"))
+        logger = FileLogger.new_for("trace.json", self._output_directory)
+        pipeline = ISXPipeline.new(self._input_directory, logger, self._isx, event_bus=self._event_bus,
+                                   throughput_history=history)
+
+        # When
+        pipeline.preprocess_videos()
+        self._event_bus.flush()
+
+        # Then
+        completed = self._events.events(EventBus.FILE_COMPLETED)
+        self.assertEqual([event["files_done"] for event in completed], [1, 2])
+        self.assertEqual(completed[-1]["eta_seconds"], 0.0)
+        self.assertEqual(pipeline.progress()["step"], "Preprocess Videos")
+        self.assertIsNotNone(history.rate("Preprocess Videos", "local"))
+        history.close()
+
+    def test_15_chaining_continues_through_steps_completed_in_an_earlier_run(self):
+        # Given
+        self._new_pipeline().preprocess_videos()
+
+        # When
+        resumed_pipeline = self._new_pipeline().preprocess_videos().bandpass_filter_videos()
+
+        # Then
+        self.assertEqual(len(resumed_pipeline.output()["videos"]), 2)
+        self.assertEqual(len(self._events.events(EventBus.STEP_SKIPPED)), 1)
+
+    def test_16_a_file_failing_in_one_run_is_retried_and_completed_on_resume_by_default(self):
+        # Given
+        self._isx.failures = {"a.isxd": 3}
+        with self.assertRaises(RuntimeError):
+            self._new_pipeline(RetryPolicy(sleep=lambda seconds: None)).preprocess_videos()
+
+        # When
+        resumed_pipeline = self._new_pipeline(RetryPolicy(sleep=lambda seconds: None)).preprocess_videos()
+
+        # Then
+        self.assertEqual(resumed_pipeline.quarantined_files(), {})
+        self.assertEqual(len(resumed_pipeline.output()["videos"]), 2)
+
+    def test_17_released_files_are_processed_again_on_resume(self):
+        # Given
+        self._isx.failures = {"a.isxd": 1}
+        pipeline = self._new_pipeline(RetryPolicy(max_attempts=1, quarantine_after=1))
+        pipeline.preprocess_videos().bandpass_filter_videos()
+        quarantined_file = pipeline.quarantined_files()["Preprocess Videos"][0]
+        self._isx.calls = []
+
+        # When
+        FileCheckpoint.new_for(self._output_directory).release_quarantine("Preprocess Videos", quarantined_file)
+        resumed_pipeline = self._new_pipeline(RetryPolicy(max_attempts=1, quarantine_after=1))
+        resumed_pipeline.preprocess_videos().bandpass_filter_videos()
+
+        # Then
+        self.assertEqual([(call[0], os.path.basename(call[1][0])) for call in self._isx.calls],
+                         [("preprocess", "a.isxd"), ("spatial_filter", "a-PP.isxd")])
+        self.assertEqual(resumed_pipeline.quarantined_files(), {})
+        self.assertEqual(len(resumed_pipeline.output()["videos"]), 2)
+
+    def test_18_an_input_removed_before_its_step_fails_on_its_own(self):
+        # Given
+        pipeline = self._new_pipeline(RetryPolicy(max_attempts=1, quarantine_after=1))
+        os.remove(os.path.join(self._input_directory, "a.isxd"))
+
+        # When
+        pipeline.preprocess_videos()
+
+        # Then
+        self.assertEqual([os.path.basename(f) for f in pipeline.quarantined_files()["Preprocess Videos"]], ["a.isxd"])
+        self.assertEqual([os.path.basename(f) for f in pipeline.output()["videos"]], ["b-PP.isxd"])
+
+    def test_19_files_of_a_step_with_quarantined_files_are_kept_for_its_resume(self):
+        # Given
+        self._isx.failures = {"a-PP.isxd": 1}
+        retention_policy = RetentionPolicy(RetentionPolicy.DELETE)
+        pipeline = self._new_pipeline(RetryPolicy(max_attempts=1, quarantine_after=1), retention_policy)
+        pipeline.preprocess_videos().bandpass_filter_videos().normalize_dff_videos()
+        quarantined_file = pipeline.quarantined_files()["Bandpass Filter Videos"][0]
+
+        # When
+        FileCheckpoint.new_for(self._output_directory).release_quarantine("Bandpass Filter Videos", quarantined_file)
+        resumed_pipeline = self._new_pipeline(RetryPolicy(max_attempts=1, quarantine_after=1), retention_policy)
+        resumed_pipeline.preprocess_videos().bandpass_filter_videos().normalize_dff_videos()
+
+        # Then
+        self.assertEqual(resumed_pipeline.quarantined_files(), {})
+        self.assertEqual(sorted(os.path.basename(f) for f in resumed_pipeline.output()["videos"]),
+                         ["a-PP-BP-DFF.isxd", "b-PP-BP-DFF.isxd"])
+        self.assertTrue(all(os.path.exists(f) for f in resumed_pipeline.output()["videos"]))
+
+    def test_20_recordings_processed_by_another_session_link_to_its_outputs(self):
+        # Given
+        content_hasher = ContentHasher(cache=os.path.join(self._directory.name, "digests.sqlite"))
+        self._new_pipeline(content_hasher=content_hasher).preprocess_videos()
+        other_input_directory = os.path.join(self._directory.name, "other videos")
+        os.makedirs(other_input_directory)
+        for video_name, content in (("copy-of-a.isxd", "a.isxd"), ("c.isxd", "c.isxd")):
+            with open(os.path.join(other_input_directory, video_name), "w") as file:
+                file.write(content)
+        self._isx.calls = []
+
+        # When
+        logger = FileLogger.new_for("trace.json", os.path.join(self._directory.name, "other output"))
+        pipeline = ISXPipeline.new(other_input_directory, logger, self._isx, event_bus=self._event_bus,
+                                   content_hasher=content_hasher)
+        pipeline.preprocess_videos()
+
+        # Then
+        self.assertEqual([os.path.basename(call[1][0]) for call in self._isx.calls], ["c.isxd"])
+        shared = pipeline.shared_inputs()[os.path.join(other_input_directory, "copy-of-a.isxd")]
+        self.assertEqual(shared["file"], os.path.join(self._input_directory, "a.isxd"))
+        self.assertEqual([os.path.basename(f) for f in shared["outputs"]], ["a-PP.isxd"])
+        self.assertEqual(len(self._events.events(EventBus.DUPLICATE_INPUT)), 1)
+
+    def test_21_recordings_the_registering_session_never_processed_are_claimed_by_the_next_one(self):
+        # Given
+        content_hasher = ContentHasher(cache=os.path.join(self._directory.name, "digests.sqlite"))
+        self._new_pipeline(content_hasher=content_hasher)
+        other_input_directory = os.path.join(self._directory.name, "other videos")
+        os.makedirs(other_input_directory)
+        with open(os.path.join(other_input_directory, "copy-of-a.isxd"), "w") as file:
+            file.write("a.isxd")
+
+        # When
+        logger = FileLogger.new_for("trace.json", os.path.join(self._directory.name, "other output"))
+        pipeline = ISXPipeline.new(other_input_directory, logger, self._isx, event_bus=self._event_bus,
+                                   content_hasher=content_hasher)
+        pipeline.preprocess_videos()
+
+        # Then
+        self.assertEqual(pipeline.shared_inputs(), {})
+        self.assertEqual([os.path.basename(call[1][0]) for call in self._isx.calls], ["copy-of-a.isxd"])
+        relaunched_pipeline = self._new_pipeline(content_hasher=content_hasher)
+        self.assertEqual(list(relaunched_pipeline.shared_inputs()), [os.path.join(self._input_directory, "a.isxd")])
+
+    def _numbered_event_paths(self, make_output_file_paths):
+        # Event files whose names do not follow the cellset name
+        created = []
+
+        def numbered(input_files, output_dir, suffix, ext="isxd"):
+            if suffix != "ED":
+                return make_output_file_paths(input_files, output_dir, suffix, ext)
+            created.append(input_files[0])
+            return [os.path.join(output_dir, f"events_{len(created)}.isxd")]
+
+        return numbered
+
+    def _new_pipeline(self, retry_policy=None, retention_policy=None, disk_space_governor=None, content_hasher=None):
+        logger = FileLogger.new_for("trace.json", self._output_directory)
+        return ISXPipeline.new(self._input_directory, logger, self._isx, retry_policy, self._event_bus,
+                               retention_policy, disk_space_governor, content_hasher)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from ci_pipe.pipeline_spec import PipelineSpec, PlanCache
+from tests.mocks.mock_pipeline import MockPipeline
+
+
+class PipelineSpecTestCase(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self._root = self._directory.name
+        self._spec = {
+            "input_directory": os.path.join(self._root, "videos"),
+            "output_directory": os.path.join(self._root, "output"),
+            "executor": {"pipeline": "tests.mocks.mock_pipeline:MockPipeline"},
+            "steps": ["double", {"step": "add", "params": {"amount": 3}}]
+        }
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def test_01_a_json_spec_compiles_into_ordered_step_plan(self):
+        # Given
+        spec_path = self._write_spec("pipeline.json", json.dumps(self._spec))
+
+        # When
+        plan = PipelineSpec.from_file(spec_path).compile()
+
+        # Then
+        self.assertEqual(plan.steps(), [("double", {}), ("add", {"amount": 3})])
+        self.assertEqual(plan.executor()["trace_file"], "trace.json")
+
+    def test_02_yaml_and_toml_specs_compile_to_the_same_plan_as_json(self):
+        # Given
+        yaml_spec = (f"input_directory: {self._spec['input_directory']}\n"
+                     f"output_directory: {self._spec['output_directory']}\n"
+                     "executor:\n  pipeline: tests.mocks.mock_pipeline:MockPipeline\n"
+                     "steps:\n  - double\n  - step: add\n    params:\n      amount: 3\n")
+        toml_spec = (f"input_directory = {json.dumps(self._spec['input_directory'])}\n"
+                     f"output_directory = {json.dumps(self._spec['output_directory'])}\n"
+                     "steps = ['double', {step = 'add', params = {amount = 3}}]\n"
+                     "[executor]\npipeline = 'tests.mocks.mock_pipeline:MockPipeline'\n")
+        json_path = self._write_spec("pipeline.json", json.dumps(self._spec))
+
+        # When
+        plans = [PipelineSpec.from_file(path).compile().as_dict() for path in
+                 (json_path, self._write_spec("pipeline.yaml", yaml_spec), self._write_spec("pipeline.toml", toml_spec))]
+
+        # Then
+        self.assertEqual(plans[0], plans[1])
+        self.assertEqual(plans[0], plans[2])
+
+    def test_03_unknown_steps_are_rejected(self):
+        # Given
+        self._spec["steps"] = ["explode"]
+
+        # When
+        with self.assertRaises(ValueError) as result:
+            PipelineSpec(self._spec).compile()
+
+        # Then
+        self.assertTrue(result.exception.args[0].startswith(PipelineSpec.UNKNOWN_STEP_ERROR))
+
+    def test_04_step_params_are_validated_against_step_signature(self):
+        # Given
+        self._spec["steps"] = [{"step": "double", "params": {"amount": 3}}]
+
+        # When
+        with self.assertRaises(ValueError) as result:
+            PipelineSpec(self._spec).compile()
+
+        # Then
+        self.assertTrue(result.exception.args[0].startswith(PipelineSpec.INVALID_PARAMS_ERROR))
+
+    def test_05_missing_required_keys_are_rejected(self):
+        # Given
+        del self._spec["steps"]
+
+        # When
+        with self.assertRaises(ValueError) as result:
+            PipelineSpec(self._spec).compile()
+
+        # Then
+        self.assertEqual(result.exception.args[0], f"{PipelineSpec.MISSING_KEY_ERROR}: 'steps'")
+
+    def test_06_compiled_plan_runs_steps_in_order(self):
+        # Given
+        plan = PipelineSpec(self._spec).compile()
+
+        # When
+        pipeline = plan.run()
+
+        # Then
+        self.assertEqual(pipeline.output(), {"numbers": [5, 7]})
+
+    def test_07_cached_plan_skips_validation_on_relaunch(self):
+        # Given
+        spec_path = self._write_spec("pipeline.json", json.dumps(self._spec))
+        cache_directory = os.path.join(self._root, "cache")
+        first_plan = PlanCache(cache_directory).plan_for(spec_path)
+
+        # When
+        with mock.patch.object(PipelineSpec, "compile") as compile_spec:
+            second_plan = PlanCache(cache_directory).plan_for(spec_path)
+
+        # Then
+        compile_spec.assert_not_called()
+        self.assertEqual(second_plan.as_dict(), first_plan.as_dict())
+
+    def test_08_public_methods_that_are_not_steps_are_rejected(self):
+        # Given
+        self._spec["steps"] = ["double", "set_defaults"]
+
+        # When
+        with self.assertRaises(ValueError) as result:
+            PipelineSpec(self._spec).compile()
+
+        # Then
+        self.assertEqual(result.exception.args[0], f"{PipelineSpec.UNKNOWN_STEP_ERROR}: 'set_defaults'")
+
+    def test_09_cached_plan_is_recompiled_when_the_pipeline_no_longer_defines_its_steps(self):
+        # Given
+        spec_path = self._write_spec("pipeline.json", json.dumps(self._spec))
+        cache_directory = os.path.join(self._root, "cache")
+        PlanCache(cache_directory).plan_for(spec_path)
+
+        # When
+        with mock.patch.object(MockPipeline, "STEPS", ("add",)):
+            with self.assertRaises(ValueError) as result:
+                PlanCache(cache_directory).plan_for(spec_path)
+
+        # Then
+        self.assertEqual(result.exception.args[0], f"{PipelineSpec.UNKNOWN_STEP_ERROR}: 'double'")
+
+    def _write_spec(self, filename, content):
+        path = os.path.join(self._root, filename)
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(content)
+        return path
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import json
+import os
+import struct
+import tempfile
+import unittest
+
+from ci_pipe.progress import ProgressEstimator, StepProgress
+from ci_pipe.throughput_history import ThroughputHistory
+from ci_pipe.step_plan import StepPlan
+from isx_pipeline.isxd_header import isxd_frame_count
+
+
+class ProgressTestCase(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self._history = ThroughputHistory.new_for(os.path.join(self._directory.name, "history.sqlite"))
+
+    def tearDown(self):
+        self._history.close()
+        self._directory.cleanup()
+
+    def test_01_history_rate_is_averaged_over_samples_of_the_same_step_and_backend(self):
+        # Given
+        self._history.record("Preprocess Videos", "local", 100, 10, 1.0, output_bytes=50)
+        self._history.record("Preprocess Videos", "local", 300, 30, 1.0)
+        self._history.record("Preprocess Videos", "work_queue", 1000, 100, 1.0)
+
+        # When
+        rate = self._history.rate("Preprocess Videos", "local")
+
+        # Then
+        self.assertEqual(rate, {"bytes_per_second": 200.0, "frames_per_second": 20.0, "output_bytes_per_byte": 0.5,
+                                "output_frames_per_frame": None})
+        self.assertIsNone(self._history.rate("Preprocess Videos", "other"))
+
+    def test_02_frame_count_is_read_from_the_isxd_footer(self):
+        # Given
+        path = self._write_isxd("movie.isxd", {"timingInfo": {"numTimes": 42}})
+
+        # When
+        frames = isxd_frame_count(path)
+
+        # Then
+        self.assertEqual(frames, 42)
+        self.assertIsNone(isxd_frame_count(self._write("plain.isxd", b"not an isxd file")))
+
+    def test_03_estimates_prefer_frames_and_fall_back_to_bytes(self):
+        # Given
+        self._history.record("Preprocess Videos", "local", 1000, 100, 10.0)
+        estimator = ProgressEstimator(self._history, "local", isxd_frame_count)
+        with_frames = estimator.measure([self._write_isxd("a.isxd", {"timingInfo": {"numTimes": 50}})])
+        without_frames = estimator.measure([self._write("b.isxd", b"x" * 500)])
+
+        # When
+        seconds_from_frames = estimator.estimate_seconds("Preprocess Videos", *with_frames)
+        seconds_from_bytes = estimator.estimate_seconds("Preprocess Videos", *without_frames)
+
+        # Then
+        self.assertEqual(seconds_from_frames, 5.0)
+        self.assertEqual(seconds_from_bytes, 5.0)
+        self.assertIsNone(estimator.estimate_seconds("Unknown", *without_frames))
+
+    def test_04_plan_estimate_skips_completed_steps_and_projects_their_output_volume(self):
+        # Given
+        self._history.record("Add", "local", 100, None, 1.0, output_bytes=200)
+        self._history.record("Doubled", "local", 100, None, 1.0)
+        plan = StepPlan("in", "out", [("add", {}), ("double", {"name": "Doubled"})],
+                        {"pipeline": "tests.mocks.mock_pipeline:MockPipeline"})
+        estimator = ProgressEstimator(self._history, "local")
+
+        # When
+        estimate = estimator.estimate_plan(plan, [self._write("a.isxd", b"x" * 100)], {"Add"})
+
+        # Then
+        self.assertEqual(estimate["steps"], [{"step": "Doubled", "seconds": 2.0}])
+        self.assertEqual(estimate["total_seconds"], 2.0)
+        self.assertEqual(estimate["bytes"], 100)
+
+    def test_05_step_progress_switches_to_the_observed_rate_once_files_finish(self):
+        # Given
+        now = [0.0]
+        progress = StepProgress("Preprocess Videos", "local", {"a": 100, "b": 100}, {"a": None, "b": None},
+                                {"bytes_per_second": 10.0, "frames_per_second": None}, clock=lambda: now[0])
+        expected_eta = progress.snapshot()["eta_seconds"]
+
+        # When
+        now[0] = 2.0
+        progress.file_finished("a", True)
+
+        # Then
+        self.assertEqual(expected_eta, 20.0)
+        snapshot = progress.snapshot()
+        self.assertEqual((snapshot["files_done"], snapshot["bytes_done"]), (1, 100))
+        self.assertEqual(snapshot["eta_seconds"], 2.0)
+
+    def test_06_steps_reading_outputs_of_unmeasured_steps_have_no_estimate(self):
+        # Given
+        self._history.record("Add", "local", 100, None, 1.0)
+        self._history.record("Double", "local", 100, None, 1.0)
+        plan = StepPlan("in", "out", [("add", {}), ("double", {})], {"pipeline": "tests.mocks.mock_pipeline:MockPipeline"})
+        estimator = ProgressEstimator(self._history, "local")
+
+        # When
+        estimate = estimator.estimate_plan(plan, [self._write("a.isxd", b"x" * 100)])
+
+        # Then
+        self.assertEqual(estimate["steps"], [{"step": "Add", "seconds": 1.0}, {"step": "Double", "seconds": None}])
+        self.assertIsNone(estimate["total_seconds"])
+
+    def _write(self, name, content):
+        path = os.path.join(self._directory.name, name)
+        with open(path, "wb") as file:
+            file.write(content)
+        return path
+
+    def _write_isxd(self, name, header):
+        header_bytes = json.dumps(header).encode("utf-8")
+        return self._write(name, b"\x00" * 64 + header_bytes + struct.pack("<Q", len(header_bytes)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,166 @@
+import json
+import os
+import tempfile
+import unittest
+
+from ci_pipe.trace_catalogue import TraceCatalogue
+
+
+class TraceCatalogueTestCase(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self._root = os.path.join(self._directory.name, "outputs")
+        self._catalogue = TraceCatalogue.new_for(os.path.join(self._directory.name, "catalogue.sqlite"))
+        self._write_trace("mouse1", ["Preprocess Videos", "Detect Events in Cells"])
+        self._write_trace("mouse2", ["Preprocess Videos"])
+
+    def tearDown(self):
+        self._catalogue.close()
+        self._directory.cleanup()
+
+    def test_01_finds_sessions_that_finished_a_step(self):
+        # Given
+        self._catalogue.update(self._root)
+
+        # When
+        steps = self._catalogue.find_steps(algorithm="Detect Events in Cells", status=TraceCatalogue.COMPLETED)
+
+        # Then
+        self.assertEqual([os.path.basename(step["directory"]) for step in steps], ["mouse1"])
+        self.assertEqual(steps[0]["seconds"], 5.0)
+
+    def test_02_finds_output_files_by_glob(self):
+        # Given
+        self._catalogue.update(self._root)
+
+        # When
+        files = self._catalogue.find_files("*mouse2*", role="output")
+
+        # Then
+        self.assertEqual([os.path.basename(f["path"]) for f in files], ["mouse2-Preprocess Videos.isxd"])
+
+    def test_03_update_only_reindexes_modified_traces(self):
+        # Given
+        self._catalogue.update(self._root)
+        trace_path = self._write_trace("mouse2", ["Preprocess Videos", "Detect Events in Cells"])
+        os.utime(trace_path, (0, 0))
+
+        # When
+        indexed_count = self._catalogue.update(self._root)
+
+        # Then
+        self.assertEqual(indexed_count, 1)
+        self.assertEqual(len(self._catalogue.find_steps(algorithm="Detect Events in Cells")), 2)
+
+    def test_04_update_forgets_deleted_traces(self):
+        # Given
+        self._catalogue.update(self._root)
+        os.remove(os.path.join(self._root, "mouse1", "trace.json"))
+
+        # When
+        self._catalogue.update(self._root)
+
+        # Then
+        self.assertEqual(self._catalogue.find_steps(algorithm="Detect Events in Cells"), [])
+
+    def test_05_indexes_per_file_status_from_checkpoints(self):
+        # Given
+        with open(os.path.join(self._root, "mouse1", "checkpoint.json"), "w") as file:
+            json.dump({"Preprocess Videos": {"completed": {"a.isxd": ["a-PP.isxd"]}, "failed": {"b.isxd": {}},
+                                             "quarantined": ["b.isxd"]}}, file)
+
+        # When
+        self._catalogue.update(self._root)
+
+        # Then
+        quarantined = self._catalogue.find_file_status(status=TraceCatalogue.QUARANTINED)
+        self.assertEqual([row["path"] for row in quarantined], ["b.isxd"])
+
+    def test_06_rebuilds_steps_for_selected_sessions(self):
+        # Given
+        self._catalogue.update(self._root)
+        trace_paths = {step["trace_path"] for step in self._catalogue.find_steps(algorithm="Detect Events in Cells")}
+
+        # When
+        steps_by_trace = self._catalogue.rebuild_steps(trace_paths)
+
+        # Then
+        steps = list(steps_by_trace.values())[0]
+        self.assertEqual([step.info()["name"] for step in steps], ["Preprocess Videos", "Detect Events in Cells"])
+
+    def test_07_released_outputs_are_indexed_at_their_archive_or_dropped_once_deleted(self):
+        # Given
+        trace_path = self._write_trace("mouse3", ["Preprocess Videos", "Bandpass Filter Videos", "Detect Events in Cells"])
+        with open(trace_path) as file:
+            trace = json.load(file)
+        preprocessed, filtered = trace["1"]["output"][0], trace["2"]["output"][0]
+        trace["1"]["released"] = {preprocessed: f"{preprocessed}.gz"}
+        trace["2"]["released"] = {filtered: None}
+        with open(trace_path, "w") as file:
+            json.dump(trace, file)
+
+        # When
+        self._catalogue.update(self._root)
+
+        # Then
+        files = self._catalogue.find_files("*mouse3-*", role="output")
+        self.assertEqual([os.path.basename(f["path"]) for f in files],
+                         ["mouse3-Preprocess Videos.isxd.gz", "mouse3-Detect Events in Cells.isxd"])
+
+    def test_08_step_status_is_derived_from_the_checkpoint(self):
+        # Given
+        with open(os.path.join(self._root, "mouse1", "checkpoint.json"), "w") as file:
+            json.dump({"Preprocess Videos": {"completed": {"a.isxd": ["a-PP.isxd"]}, "failed": {"b.isxd": {}},
+                                             "quarantined": ["b.isxd"]},
+                       "Auto Accept-Reject Cells": {"completed": {}, "failed": {"c.isxd": {}}, "quarantined": []}},
+                      file)
+
+        # When
+        self._catalogue.update(self._root)
+
+        # Then
+        statuses = {(os.path.basename(step["directory"]), step["algorithm"]): step["status"]
+                    for step in self._catalogue.find_steps()}
+        self.assertEqual(statuses[("mouse1", "Preprocess Videos")], TraceCatalogue.QUARANTINED)
+        self.assertEqual(statuses[("mouse1", "Detect Events in Cells")], TraceCatalogue.COMPLETED)
+        self.assertEqual(statuses[("mouse1", "Auto Accept-Reject Cells")], TraceCatalogue.FAILED)
+        failed = self._catalogue.find_steps(status=TraceCatalogue.FAILED, file="c.isxd")
+        self.assertEqual([step["algorithm"] for step in failed], ["Auto Accept-Reject Cells"])
+
+    def test_09_relative_paths_are_resolved_against_the_directory_the_pipeline_ran_in(self):
+        # Given
+        trace_path = self._write_trace("mouse3", ["Preprocess Videos"])
+        with open(trace_path) as file:
+            trace = json.load(file)
+        trace["1"].update({"output": ["outputs/mouse3/step 1 - Preprocess Videos/a-PP.isxd"],
+                           "working_directory": self._directory.name})
+        with open(trace_path, "w") as file:
+            json.dump(trace, file)
+        with open(os.path.join(self._root, "mouse3", "checkpoint.json"), "w") as file:
+            json.dump({"Preprocess Videos": {"completed": {}, "failed": {"videos/b.isxd": {}},
+                                             "quarantined": ["videos/b.isxd"]}}, file)
+
+        # When
+        self._catalogue.update(self._root)
+
+        # Then
+        outputs = self._catalogue.find_files(os.path.join(self._root, "mouse3", "*", "a-PP.isxd"))
+        self.assertEqual(len(outputs), 1)
+        quarantined = self._catalogue.find_file_status(status=TraceCatalogue.QUARANTINED)
+        self.assertEqual([row["path"] for row in quarantined], [os.path.join(self._directory.name, "videos", "b.isxd")])
+
+    def _write_trace(self, session, algorithms):
+        session_directory = os.path.join(self._root, session)
+        os.makedirs(session_directory, exist_ok=True)
+        trace = {str(index): {"algorithm": algorithm, "input": [f"{session}.isxd"],
+                              "output": [os.path.join(session_directory, f"{session}-{algorithm}.isxd")],
+                              "started_at": 100.0 * index, "finished_at": 100.0 * index + 5}
+                 for index, algorithm in enumerate(algorithms, 1)}
+        trace_path = os.path.join(session_directory, "trace.json")
+        with open(trace_path, "w") as file:
+            json.dump(trace, file)
+        return trace_path
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,172 @@
+import os
+import tempfile
+import threading
+import unittest
+
+from ci_pipe.retry_policy import RetryPolicy
+from ci_pipe.work_queue import WorkQueue, WorkQueueExecutor, WorkQueueWorker
+from isx_pipeline.isx_pipeline import ISXPipeline
+from isx_pipeline.isx_tasks import run_task
+from logger.event_bus import EventBus
+from logger.event_sinks import InMemoryEventSink
+from logger.file_logger import FileLogger
+from tests.mocks.mock_isx import MockIsx
+
+
+class WorkQueueTestCase(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self._queue_path = os.path.join(self._directory.name, "queue.sqlite")
+        self._work_queue = WorkQueue.new_for(self._queue_path)
+        self._task = {"operation": "preprocess", "input_files": ["a.isxd"], "output_files": ["a-PP.isxd"],
+                      "params": {}}
+
+    def tearDown(self):
+        self._work_queue.close()
+        self._directory.cleanup()
+
+    def test_01_claimed_tasks_carry_their_parameters_and_paths(self):
+        # Given
+        batch = self._work_queue.submit([self._task])
+
+        # When
+        task = self._work_queue.claim("worker-1")
+        self._work_queue.complete(task["id"])
+
+        # Then
+        self.assertEqual(task["input_files"], ["a.isxd"])
+        self.assertEqual(task["output_files"], ["a-PP.isxd"])
+        self.assertIsNone(self._work_queue.claim("worker-1"))
+        self.assertEqual([result["status"] for result in self._work_queue.results(batch)], [WorkQueue.DONE])
+
+    def test_02_failed_tasks_are_requeued_until_attempts_run_out(self):
+        # Given
+        batch = self._work_queue.submit([self._task], max_attempts=2, retry_delays=[0])
+
+        # When
+        self._work_queue.fail(self._work_queue.claim("worker-1")["id"], "boom")
+        requeued_task = self._work_queue.claim("worker-1")
+        self._work_queue.fail(requeued_task["id"], "boom again")
+
+        # Then
+        self.assertIsNotNone(requeued_task)
+        self.assertTrue(self._work_queue.is_finished(batch))
+        self.assertEqual([result["error"] for result in self._work_queue.results(batch)], ["boom again"])
+
+    def test_03_pipeline_steps_run_on_several_local_workers(self):
+        # Given
+        input_directory = os.path.join(self._directory.name, "videos")
+        os.makedirs(input_directory)
+        for index in range(6):
+            with open(os.path.join(input_directory, f"video{index}.isxd"), "w") as file:
+                file.write("frames")
+        isx = MockIsx(failures={"video3.isxd": 5})
+        stop = threading.Event()
+        workers = [threading.Thread(target=self._run_worker, args=(isx, f"worker-{index}", stop)) for index in range(3)]
+        for worker in workers:
+            worker.start()
+        events = InMemoryEventSink()
+        event_bus = EventBus([events])
+        logger = FileLogger.new_for("trace.json", os.path.join(self._directory.name, "output"))
+        executor = WorkQueueExecutor(self._work_queue, poll_seconds=0.01)
+
+        # When
+        try:
+            retry_policy = RetryPolicy(max_attempts=2, backoff_seconds=0, quarantine_after=1)
+            pipeline = ISXPipeline.new(input_directory, logger, isx, retry_policy, event_bus, task_executor=executor)
+            pipeline.preprocess_videos()
+        finally:
+            stop.set()
+            for worker in workers:
+                worker.join()
+            event_bus.close()
+
+        # Then
+        trace_outputs = logger.read_json_from_file()["1"]["output"]["videos"]
+        self.assertEqual(len(trace_outputs), 5)
+        self.assertTrue(all(os.path.exists(f) for f in trace_outputs))
+        self.assertEqual([os.path.basename(f) for f in pipeline.quarantined_files()["Preprocess Videos"]],
+                         ["video3.isxd"])
+
+    def test_04_tasks_abandoned_by_a_crashed_worker_are_reclaimed_once_their_lease_expires(self):
+        # Given
+        work_queue = WorkQueue.new_for(self._queue_path, lease_seconds=0)
+        batch = work_queue.submit([self._task], max_attempts=2)
+        abandoned_task = work_queue.claim("crashed-worker")
+        runs = []
+        worker = WorkQueueWorker(work_queue, lambda *task: runs.append(task), "live-worker")
+
+        # When
+        worker.run_once()
+        work_queue.fail(abandoned_task["id"], "late result from the crashed worker", abandoned_task["attempt"])
+
+        # Then
+        self.assertEqual(len(runs), 1)
+        self.assertTrue(work_queue.is_finished(batch))
+        result = work_queue.results(batch)[0]
+        self.assertEqual((result["status"], result["worker"]), (WorkQueue.DONE, "live-worker"))
+        work_queue.close()
+
+    def test_05_executor_finishes_a_batch_whose_only_worker_crashed(self):
+        # Given
+        work_queue = WorkQueue.new_for(self._queue_path, lease_seconds=0)
+        executor = WorkQueueExecutor(work_queue, poll_seconds=0, timeout_seconds=1,
+                                     sleep=lambda seconds: work_queue.claim("crashed-worker"))
+
+        # When
+        errors = executor.run([self._task], RetryPolicy(max_attempts=1))
+
+        # Then
+        self.assertIn(WorkQueue.LEASE_EXPIRED_ERROR, str(errors[0]))
+        work_queue.close()
+
+    def test_06_pipeline_tasks_carry_absolute_paths_for_workers_in_other_directories(self):
+        # Given
+        os.makedirs(os.path.join(self._directory.name, "videos"))
+        with open(os.path.join(self._directory.name, "videos", "a.isxd"), "w") as file:
+            file.write("a")
+        claimed_paths = []
+        worker = WorkQueueWorker(self._work_queue, lambda operation, input_files, output_files, params:
+                                 claimed_paths.extend(input_files + output_files), "worker-1")
+        executor = WorkQueueExecutor(self._work_queue, poll_seconds=0, sleep=lambda seconds: worker.run_once())
+        working_directory = os.getcwd()
+        os.chdir(self._directory.name)
+        event_bus = EventBus([InMemoryEventSink()])
+
+        # When
+        try:
+            logger = FileLogger.new_for("trace.json", "output")
+            pipeline = ISXPipeline.new("videos", logger, MockIsx(), event_bus=event_bus, task_executor=executor)
+            pipeline.preprocess_videos()
+        finally:
+            os.chdir(working_directory)
+            event_bus.close()
+
+        # Then
+        self.assertEqual(len(claimed_paths), 2)
+        self.assertTrue(all(os.path.isabs(path) for path in claimed_paths))
+
+    def test_07_before_task_gates_every_task_submitted_to_the_queue(self):
+        # Given
+        before_task_calls = []
+        worker = WorkQueueWorker(self._work_queue, lambda *task: None, "worker-1")
+        executor = WorkQueueExecutor(self._work_queue, poll_seconds=0, max_in_flight=1,
+                                     sleep=lambda seconds: worker.run_once())
+
+        # When
+        errors = executor.run([self._task] * 3, RetryPolicy(max_attempts=1), lambda: before_task_calls.append(True))
+
+        # Then
+        self.assertEqual(errors, [None, None, None])
+        self.assertEqual(len(before_task_calls), 3)
+
+    def _run_worker(self, isx, name, stop):
+        work_queue = WorkQueue.new_for(self._queue_path)
+        worker = WorkQueueWorker(work_queue, lambda operation, input_files, output_files, params: run_task(
+            isx, operation, input_files, output_files, params), name, poll_seconds=0.01)
+        worker.run(should_stop=stop.is_set)
+        work_queue.close()
+
+
+if __name__ == '__main__':
+    unittest.main()